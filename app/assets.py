@@ -0,0 +1,113 @@
+"""
+Fingerprinted static asset URLs.
+
+static_url("style.css") returns "/static/style.<hash>.css", where <hash> is
+a prefix of the SHA-256 of the file's bytes. The URL changes whenever the
+file does, so fingerprinted responses are served with a one-year immutable
+Cache-Control and repeat visitors never revalidate them. Unversioned URLs
+still work but must be revalidated on every use.
+
+build_static.py writes the manifest (logical path -> fingerprinted path) to
+app/asset-manifest.json at deploy time. Without it, the app hashes the
+static directory itself on startup.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+from .compression import PrecompressedStaticFiles
+
+HASH_LENGTH = 10
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % HASH_LENGTH)
+
+# Precompressed copies are variants of the file they were built from, not assets
+_SKIP_SUFFIXES = (".gz", ".br")
+
+def fingerprint(path: str, digest: str) -> str:
+    """Insert the digest before the extension: css/site.css -> css/site.<digest>.css"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+def file_digest(full_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def build_manifest(directory: str) -> Dict[str, str]:
+    """Hash every file under `directory`, keyed by its /-separated relative path"""
+    manifest = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(_SKIP_SUFFIXES):
+                continue
+            full_path = os.path.join(root, name)
+            path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+            manifest[path] = fingerprint(path, file_digest(full_path))
+    return manifest
+
+class AssetManifest:
+    """Maps static paths to fingerprinted URLs and back"""
+
+    def __init__(self, directory: str, manifest_path: Optional[str] = None, prefix: str = "/static/"):
+        self.directory = directory
+        self.manifest_path = manifest_path
+        self.prefix = prefix
+        self.assets: Dict[str, str] = {}
+        self._originals: Dict[str, str] = {}
+        self.load()
+
+    def load(self) -> None:
+        if self.manifest_path and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                assets = json.load(f)
+        else:
+            assets = build_manifest(self.directory)
+        self.assets = assets
+        self._originals = {v: k for k, v in assets.items()}
+
+    def url(self, path: str) -> str:
+        """
+        Fingerprinted URL for "style.css" or "/static/style.css". Other URLs
+        (media, external or data: images) and unknown files are returned as is.
+        """
+        if path.startswith(self.prefix):
+            path = path[len(self.prefix):]
+        elif path.startswith("/") or ":" in path:
+            return path
+        return self.prefix + self.assets.get(path, path)
+
+    def resolve(self, path: str) -> Tuple[str, bool]:
+        """
+        Map a requested path to the file to serve, and whether it may be cached
+        forever. A fingerprint that no longer matches (a page cached from an
+        older deploy) still serves the current file, just not as immutable.
+        """
+        original = self._originals.get(path)
+        if original is not None:
+            return original, True
+        match = _FINGERPRINT.match(path)
+        if match and match.group("stem") + match.group("ext") in self.assets:
+            return match.group("stem") + match.group("ext"), False
+        return path, False
+
+class AssetStaticFiles(PrecompressedStaticFiles):
+    """Serves fingerprinted paths as immutable and everything else as must-revalidate"""
+
+    def __init__(self, *, manifest: AssetManifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope):
+        path, immutable = self.manifest.resolve(path.replace(os.sep, "/"))
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
@@ -0,0 +1,188 @@
+"""
+Bounded in-process caches.
+
+TTLCache is a thread-safe LRU cache whose entries also expire after a fixed
+time-to-live. It is safe to share between the threadpool that runs sync
+routes and the event loop. Read-through callers take its generation before
+loading a value and pass it to set(), so a value read before a concurrent
+invalidation is not stored over it. PageCache builds on it to cache rendered pages,
+FragmentCache to cache rendered template macros such as one course card.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from jinja2 import Environment
+from markupsafe import Markup
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+_MISSING = object()
+
+class TTLCache:
+    """LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; see set()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_sets = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value); a cached None is a hit"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            generation: Optional[int] = None) -> None:
+        """Store a value; with a generation, only if nothing was invalidated since it was taken"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_sets += 1
+                return
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> None:
+        """Drop every entry whose value matches the predicate"""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_sets": self.stale_sets,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+class PageCache:
+    """
+    Cache of rendered HTML responses for public GET routes.
+
+    Entries are keyed by route name, full URL and the current catalog
+    version, so any write that bumps the version makes every cached page
+    unreachable at once; stale entries then age out of the LRU. The TTL
+    bounds staleness for writes made by other processes.
+    """
+
+    def __init__(self, version: Callable[[], int], maxsize: int = 256, ttl: float = 60.0,
+                 max_body: int = 512 * 1024, disabled: Tuple[str, ...] = ()):
+        self.version = version
+        self.max_body = max_body
+        self.disabled = set(disabled)
+        self.enabled = True
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def cached(self, name: str):
+        """Decorate a route that takes `request` and returns an HTML response"""
+        def decorator(func):
+            is_async = inspect.iscoroutinefunction(func)
+
+            async def call(*args, **kwargs):
+                if is_async:
+                    return await func(*args, **kwargs)
+                return await run_in_threadpool(func, *args, **kwargs)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs["request"]
+                if not self.enabled or name in self.disabled or request.method not in ("GET", "HEAD"):
+                    return await call(*args, **kwargs)
+
+                key = (name, str(request.url), self.version())
+                found, entry = self.entries.lookup(key)
+                if found:
+                    status_code, body, media_type = entry
+                    return Response(body, status_code=status_code, media_type=media_type,
+                                    headers={"X-Page-Cache": "HIT"})
+
+                response = await call(*args, **kwargs)
+                if response.status_code == 200 and len(response.body) <= self.max_body:
+                    self.entries.set(key, (response.status_code, response.body, response.media_type))
+                response.headers["X-Page-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        stats = self.entries.stats()
+        stats["disabled_routes"] = sorted(self.disabled)
+        return stats
+
+class FragmentCache:
+    """
+    Cache of HTML rendered by one Jinja macro.
+
+    Callers pass a key that changes whenever the rendered output would, e.g.
+    a document id plus its updated_at, so edits never need an explicit
+    invalidation; superseded entries age out of the LRU. A None key renders
+    without caching.
+    """
+
+    def __init__(self, env: Environment, template: str, macro: str, maxsize: int = 5000, ttl: float = 3600.0):
+        self.env = env
+        self.template = template
+        self.macro = macro
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def render(self, key: Optional[Hashable], *args, **kwargs) -> Markup:
+        if key is not None:
+            found, html = self.entries.lookup(key)
+            if found:
+                return html
+        macro = getattr(self.env.get_template(self.template).module, self.macro)
+        html = Markup(macro(*args, **kwargs))
+        if key is not None:
+            self.entries.set(key, html)
+        return html
+
+    def stats(self) -> dict:
+        return self.entries.stats()
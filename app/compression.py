@@ -0,0 +1,196 @@
+"""
+Response compression.
+
+CompressionMiddleware negotiates Accept-Encoding for dynamic responses and
+compresses text bodies with brotli (when the `brotli` package is installed)
+or gzip. Responses that already carry a Content-Encoding, such as gzipped
+sitemaps or precompressed static files, pass through untouched.
+
+PrecompressedStaticFiles serves the .br/.gz copies that build_static.py
+writes next to each static file, so CSS and friends cost no CPU per request.
+"""
+
+import mimetypes
+import os
+import stat
+import zlib
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference order; brotli is only offered when it can be produced
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+def negotiate(accept_encoding: str, available=ENCODINGS) -> Optional[str]:
+    """Pick the first of `available` the client accepts with a non-zero q"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+class _Compressor:
+    """Incremental brotli or gzip encoder"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            # wbits=31 writes a gzip header and trailer
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+class CompressionMiddleware:
+    """ASGI middleware compressing text responses the client can decode"""
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows the size
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if compressor is not None:
+                body = compressor.compress(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += compressor.finish()
+                await send({"type": "http.response.body", "body": body, "more_body": message.get("more_body", False)})
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            eligible = (is_compressible(headers.get("content-type", ""))
+                        and "content-encoding" not in headers
+                        and start["status"] not in (204, 304))
+            if eligible:
+                _add_vary(headers)
+            if not eligible or encoding is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Encoding"] = encoding
+            body = compressor.compress(body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body += compressor.finish()
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers an up-to-date .br or .gz sibling of the requested file"""
+
+    async def get_response(self, path: str, scope):
+        content_type = mimetypes.guess_type(path)[0] or ""
+        if not is_compressible(content_type):
+            return await super().get_response(path, scope)
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        for encoding in ("br", "gzip"):
+            if negotiate(accept_encoding, (encoding,)) is None:
+                continue
+            variant_path, variant_stat = await anyio.to_thread.run_sync(self.lookup_path, path + SUFFIXES[encoding])
+            if not variant_stat or not stat.S_ISREG(variant_stat.st_mode):
+                continue
+            original_path, original_stat = await anyio.to_thread.run_sync(self.lookup_path, path)
+            # A stale copy (older than the file it was built from) is ignored
+            if original_stat and variant_stat.st_mtime >= original_stat.st_mtime:
+                response = self.file_response(variant_path, variant_stat, scope)
+                response.headers["Content-Type"] = content_type
+                response.headers["Content-Encoding"] = encoding
+                _add_vary(response.headers)
+                return response
+
+        response = await super().get_response(path, scope)
+        _add_vary(response.headers)
+        return response
+
+def precompress(path: str, gzip_level: int = 9, brotli_quality: int = 11) -> list:
+    """Write .gz (and .br when available) copies of a file, return the paths written"""
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = {".gz": lambda: _gzip(data, gzip_level)}
+    if brotli is not None:
+        variants[".br"] = lambda: brotli.compress(data, quality=brotli_quality)
+    written = []
+    for suffix, build in variants.items():
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            continue
+        compressed = build()
+        if len(compressed) >= len(data):
+            continue
+        with open(target, "wb") as f:
+            f.write(compressed)
+        written.append(target)
+    return written
+
+def _gzip(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
@@ -1,7 +1,13 @@
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import os
 import re
+import threading
+import time
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from .database_mongo import (
     courses_collection,
@@ -11,6 +17,9 @@ from .database_mongo import (
     sync_blog_posts_collection,
     sync_pages_collection
 )
+from .search import SearchIndex
+from .redirects import RedirectTable
+from .cache import TTLCache
 
 def slugify(text: str) -> str:
     """Convert text to URL-friendly slug"""
@@ -18,86 +27,152 @@ def slugify(text: str) -> str:
     text = re.sub(r'[^a-z0-9\s-]', '', text)
     return re.sub(r'\s+', '-', text).strip('-')
 
+# ============ COURSE CACHE ============
+# Slug lookups (/course/{slug}, /go/{slug}) are served from a bounded
+# read-through cache. Every course write in this module invalidates the
+# affected entries; the TTL bounds staleness for writes made elsewhere. A
+# document read while a write invalidated the cache is returned but not
+# cached, so it can't outlive that write.
+# Cached documents never hold a legacy inline base64 image (often hundreds
+# of KB): it is swapped for the /image/course/{slug} URL that serves it.
+
+COURSE_CACHE_SIZE = int(os.getenv("COURSE_CACHE_SIZE", "1024"))
+COURSE_CACHE_TTL = float(os.getenv("COURSE_CACHE_TTL", "300"))
+# Unknown slugs are remembered briefly so 404 floods don't reach Atlas either
+COURSE_MISS_TTL = 30.0
+
+course_cache = TTLCache(maxsize=COURSE_CACHE_SIZE, ttl=COURSE_CACHE_TTL)
+
+def _cache_course(slug: str, course: Optional[dict], generation: int) -> None:
+    course_cache.set(slug, course, ttl=None if course else COURSE_MISS_TTL, generation=generation)
+
+def _invalidate_course_id(course_id: ObjectId) -> None:
+    course_cache.invalidate_where(lambda c: c is not None and c.get("_id") == course_id)
+
+def get_course_cache_stats() -> dict:
+    """Hit/miss counters for the slug cache"""
+    return course_cache.stats()
+
+# ============ CATALOG VERSION ============
+# Bumped by every write in this module. The rendered-page cache keys on it,
+# so a single write makes every cached page stale at once.
+
+_catalog_version = 0
+_catalog_version_lock = threading.Lock()
+
+def catalog_version() -> int:
+    """Current catalog version stamp"""
+    return _catalog_version
+
+def bump_catalog_version() -> None:
+    """Mark every cached rendering of the catalog as stale"""
+    global _catalog_version
+    with _catalog_version_lock:
+        _catalog_version += 1
+
 # ============ COURSE OPERATIONS ============
 
-async def create_course_async(course_data: dict) -> dict:
-    """Create or update a course (async)"""
+COURSE_FIELDS = ("title", "description", "rating", "instructor", "coupon", "image", "image_meta", "udemy_link")
+MAX_BULK_COURSES = 1000
+
+def _course_upsert(course_data: dict, now: datetime) -> Tuple[dict, dict]:
+    """
+    Build the (filter, update) pair that creates or updates a course by slug
+    in one round-trip. Fields that are None only fill in new documents, so an
+    update never blanks out existing data, and created_at is only ever set
+    on insert.
+    """
     slug = slugify(course_data.get("title", ""))
-    
-    # Check if course with this slug already exists
-    existing = await courses_collection.find_one({"slug": slug})
-    
-    course_doc = {
-        "title": course_data.get("title"),
-        "slug": slug,
-        "description": course_data.get("description"),
-        "rating": course_data.get("rating"),
-        "instructor": course_data.get("instructor"),
-        "coupon": course_data.get("coupon"),
-        "image": course_data.get("image"),
-        "udemy_link": course_data.get("udemy_link"),
-        "created_at": datetime.utcnow()
+    values = {k: course_data.get(k) for k in COURSE_FIELDS}
+    present = {k: v for k, v in values.items() if v is not None}
+    missing = {k: None for k, v in values.items() if v is None}
+    update = {
+        "$set": {**present, "slug": slug, "updated_at": now},
+        "$setOnInsert": {**missing, "created_at": now}
     }
+    return {"slug": slug}, update
+
+def _course_written(doc: dict) -> None:
+    """Bring the in-process indexes up to date with a created or updated course"""
+    course_search_index.add(doc)
+    redirect_table.set(doc)
+    course_cache.invalidate(doc["slug"])
 
-    if existing:
-        # Update existing course
-        # Don't overwrite created_at
-        course_doc["updated_at"] = datetime.utcnow()
-        del course_doc["created_at"]
-        
-        # Only update fields that are present in course_data
-        update_fields = {k: v for k, v in course_doc.items() if v is not None}
-        
-        await courses_collection.update_one(
-            {"_id": existing["_id"]},
-            {"$set": update_fields}
-        )
-        # Return the updated document
-        course_doc["_id"] = existing["_id"]
-        return course_doc
-    
-    result = await courses_collection.insert_one(course_doc)
-    course_doc["_id"] = result.inserted_id
+async def create_course_async(course_data: dict) -> dict:
+    """Create or update a course (async)"""
+    query, update = _course_upsert(course_data, datetime.utcnow())
+    course_doc = await courses_collection.find_one_and_update(
+        query, update, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    _course_written(course_doc)
+    bump_catalog_version()
     return course_doc
 
 def create_course_sync(course_data: dict) -> dict:
     """Create or update a course (sync)"""
-    slug = slugify(course_data.get("title", ""))
-    
-    # Check if course with this slug already exists
-    existing = sync_courses_collection.find_one({"slug": slug})
-    
-    course_doc = {
-        "title": course_data.get("title"),
-        "slug": slug,
-        "description": course_data.get("description"),
-        "rating": course_data.get("rating"),
-        "instructor": course_data.get("instructor"),
-        "coupon": course_data.get("coupon"),
-        "image": course_data.get("image"),
-        "udemy_link": course_data.get("udemy_link"),
-        "created_at": datetime.utcnow()
-    }
-
-    if existing:
-        # Update existing course
-        # Don't overwrite created_at
-        course_doc["updated_at"] = datetime.utcnow()
-        del course_doc["created_at"]
-        
-        # Only update fields that are present in course_data
-        update_fields = {k: v for k, v in course_doc.items() if v is not None}
-        
-        sync_courses_collection.update_one(
-            {"_id": existing["_id"]},
-            {"$set": update_fields}
-        )
-        return course_doc
-    
-    result = sync_courses_collection.insert_one(course_doc)
-    course_doc["_id"] = result.inserted_id
+    query, update = _course_upsert(course_data, datetime.utcnow())
+    course_doc = sync_courses_collection.find_one_and_update(
+        query, update, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    _course_written(course_doc)
+    bump_catalog_version()
     return course_doc
 
+def _bulk_results(slugs: List[str], details: dict) -> List[dict]:
+    """Per-item outcome of a bulk upsert, in request order"""
+    upserted = {u["index"]: u["_id"] for u in details.get("upserted", [])}
+    errors = {e["index"]: e.get("errmsg", "write failed") for e in details.get("writeErrors", [])}
+    results = []
+    for i, slug in enumerate(slugs):
+        if i in errors:
+            results.append({"index": i, "slug": slug, "status": "error", "error": errors[i]})
+        elif i in upserted:
+            results.append({"index": i, "slug": slug, "status": "created", "id": str(upserted[i])})
+        else:
+            results.append({"index": i, "slug": slug, "status": "updated"})
+    return results
+
+def _bulk_upserts(courses: List[dict]) -> Tuple[List[str], List[UpdateOne]]:
+    now = datetime.utcnow()
+    slugs, ops = [], []
+    for course_data in courses:
+        query, update = _course_upsert(course_data, now)
+        slugs.append(query["slug"])
+        ops.append(UpdateOne(query, update, upsert=True))
+    return slugs, ops
+
+async def upsert_courses_async(courses: List[dict]) -> List[dict]:
+    """Create or update many courses in one bulk write (async)"""
+    if not courses:
+        return []
+    slugs, ops = _bulk_upserts(courses)
+    try:
+        details = (await courses_collection.bulk_write(ops, ordered=False)).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+    results = _bulk_results(slugs, details)
+    written = list({r["slug"] for r in results if r["status"] != "error"})
+    async for doc in courses_collection.find({"slug": {"$in": written}}, {**SEARCH_FIELDS, **REDIRECT_FIELDS}):
+        _course_written(doc)
+    bump_catalog_version()
+    return results
+
+def upsert_courses_sync(courses: List[dict]) -> List[dict]:
+    """Create or update many courses in one bulk write (sync)"""
+    if not courses:
+        return []
+    slugs, ops = _bulk_upserts(courses)
+    try:
+        details = sync_courses_collection.bulk_write(ops, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+    results = _bulk_results(slugs, details)
+    written = list({r["slug"] for r in results if r["status"] != "error"})
+    for doc in sync_courses_collection.find({"slug": {"$in": written}}, {**SEARCH_FIELDS, **REDIRECT_FIELDS}):
+        _course_written(doc)
+    bump_catalog_version()
+    return results
+
 async def get_courses_async(limit: Optional[int] = None) -> List[dict]:
     """Get all courses (async)"""
     cursor = courses_collection.find().sort("created_at", -1)
@@ -113,13 +188,94 @@ def get_courses_sync(limit: Optional[int] = None) -> List[dict]:
         cursor = cursor.limit(limit)
     return list(cursor)
 
+# ============ KEYSET PAGINATION ============
+# Pages are ordered by (created_at, _id) descending. The cursor encodes the
+# last document of a page, so every page is a bounded index range scan on
+# created_at regardless of how deep into the catalog the visitor is.
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(doc: dict) -> Optional[str]:
+    """Build an opaque page cursor from the last document of a page"""
+    created_at = doc.get("created_at")
+    if not created_at:
+        return None
+    millis = int(created_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return f"{millis}-{doc['_id']}"
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, ObjectId]]:
+    """Parse a page cursor, returning None for missing or malformed input"""
+    if not cursor:
+        return None
+    try:
+        millis, oid = cursor.split("-", 1)
+        created_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc).replace(tzinfo=None)
+        return created_at, ObjectId(oid)
+    except (ValueError, InvalidId):
+        return None
+
+def _page_query(cursor: Optional[str]) -> dict:
+    position = decode_cursor(cursor)
+    if not position:
+        return {}
+    created_at, oid = position
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}}
+    ]}
+
+def _page_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _split_page(docs: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    # One extra document is fetched to know whether another page exists
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+async def get_courses_page_async(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of courses, newest first, plus the cursor of the next page (async)"""
+    limit = _page_limit(limit)
+    docs = await courses_collection.find(_page_query(cursor)).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    return _split_page(docs, limit)
+
+def get_courses_page_sync(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of courses, newest first, plus the cursor of the next page (sync)"""
+    limit = _page_limit(limit)
+    docs = list(sync_courses_collection.find(_page_query(cursor)).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1))
+    return _split_page(docs, limit)
+
+def _course_page_pipeline(slug: str) -> List[dict]:
+    return [
+        {"$match": {"slug": slug}},
+        {"$limit": 1},
+        {"$addFields": {"image": _image_ref_expr("/image/course/")}}
+    ]
+
 async def get_course_async(slug: str) -> Optional[dict]:
-    """Get a single course by slug (async)"""
-    return await courses_collection.find_one({"slug": slug})
+    """Get a single course by slug, through the course cache (async)"""
+    found, course = course_cache.lookup(slug)
+    if not found:
+        generation = course_cache.generation
+        docs = await courses_collection.aggregate(_course_page_pipeline(slug)).to_list(length=1)
+        course = docs[0] if docs else None
+        _cache_course(slug, course, generation)
+    return course
 
 def get_course_sync(slug: str) -> Optional[dict]:
-    """Get a single course by slug (sync)"""
-    return sync_courses_collection.find_one({"slug": slug})
+    """Get a single course by slug, through the course cache (sync)"""
+    found, course = course_cache.lookup(slug)
+    if not found:
+        generation = course_cache.generation
+        course = next(sync_courses_collection.aggregate(_course_page_pipeline(slug)), None)
+        _cache_course(slug, course, generation)
+    return course
 
 async def get_course_by_id_async(course_id: str) -> Optional[dict]:
     """Get a single course by ID (async)"""
@@ -136,6 +292,16 @@ async def update_course_async(course_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(course_id)},
         {"$set": update_data}
     )
+    _invalidate_course_id(ObjectId(course_id))
+    if "title" in update_data or "description" in update_data:
+        doc = await courses_collection.find_one({"_id": ObjectId(course_id)}, SEARCH_FIELDS)
+        if doc:
+            course_search_index.add(doc)
+    if "slug" in update_data or "udemy_link" in update_data:
+        doc = await courses_collection.find_one({"_id": ObjectId(course_id)}, REDIRECT_FIELDS)
+        if doc:
+            redirect_table.set(doc)
+    bump_catalog_version()
     return result.modified_count > 0
 
 def update_course_sync(course_id: str, update_data: dict) -> bool:
@@ -145,38 +311,377 @@ def update_course_sync(course_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(course_id)},
         {"$set": update_data}
     )
+    _invalidate_course_id(ObjectId(course_id))
+    if "title" in update_data or "description" in update_data:
+        doc = sync_courses_collection.find_one({"_id": ObjectId(course_id)}, SEARCH_FIELDS)
+        if doc:
+            course_search_index.add(doc)
+    if "slug" in update_data or "udemy_link" in update_data:
+        doc = sync_courses_collection.find_one({"_id": ObjectId(course_id)}, REDIRECT_FIELDS)
+        if doc:
+            redirect_table.set(doc)
+    bump_catalog_version()
     return result.modified_count > 0
 
 async def delete_course_async(course_id: str) -> bool:
     """Delete a course (async)"""
     result = await courses_collection.delete_one({"_id": ObjectId(course_id)})
+    course_search_index.remove(ObjectId(course_id))
+    redirect_table.remove(ObjectId(course_id))
+    _invalidate_course_id(ObjectId(course_id))
+    bump_catalog_version()
     return result.deleted_count > 0
 
 def delete_course_sync(course_id: str) -> bool:
     """Delete a course (sync)"""
     result = sync_courses_collection.delete_one({"_id": ObjectId(course_id)})
+    course_search_index.remove(ObjectId(course_id))
+    redirect_table.remove(ObjectId(course_id))
+    _invalidate_course_id(ObjectId(course_id))
+    bump_catalog_version()
     return result.deleted_count > 0
 
+async def delete_courses_by_days_async(days: int) -> int:
+    """Delete courses created in the last N days (async)"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = await courses_collection.delete_many({
+        "created_at": {"$gte": cutoff}
+    })
+    course_search_index.remove_where_created_since(cutoff)
+    redirect_table.clear()
+    await refresh_redirect_table_async()
+    course_cache.clear()
+    bump_catalog_version()
+    return result.deleted_count
+
 def delete_courses_by_days_sync(days: int) -> int:
     """Delete courses created in the last N days (sync)"""
     cutoff = datetime.utcnow() - timedelta(days=days)
     result = sync_courses_collection.delete_many({
         "created_at": {"$gte": cutoff}
     })
+    course_search_index.remove_where_created_since(cutoff)
+    redirect_table.clear()
+    refresh_redirect_table_sync()
+    course_cache.clear()
+    bump_catalog_version()
     return result.deleted_count
 
-async def search_courses_async(query: str) -> List[dict]:
-    """Search courses by title (async)"""
-    courses = await courses_collection.find(
-        {"title": {"$regex": query, "$options": "i"}}
-    ).to_list(length=None)
-    return courses
-
-def search_courses_sync(query: str) -> List[dict]:
-    """Search courses by title (sync)"""
-    return list(sync_courses_collection.find(
-        {"title": {"$regex": query, "$options": "i"}}
-    ))
+# ============ SEARCH ============
+# Search runs against an in-process inverted index (app/search.py). Writes
+# through this module update it immediately; writes from other processes
+# (the bot's API calls on another worker, maintenance scripts) are picked up
+# by a periodic catch-up query on created_at/updated_at. Documents deleted
+# elsewhere simply drop out when their ids are resolved to cards.
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_REFRESH_SECONDS = 60
+SEARCH_FIELDS = {"title": 1, "description": 1, "created_at": 1, "updated_at": 1}
+
+course_search_index = SearchIndex()
+_search_synced_at: Optional[float] = None
+_search_sync_lock = threading.Lock()
+
+def _search_index_stale() -> bool:
+    return _search_synced_at is None or time.monotonic() - _search_synced_at > SEARCH_REFRESH_SECONDS
+
+def _changed_since(watermark: Optional[datetime]) -> dict:
+    if watermark is None:
+        return {}
+    return {"$or": [
+        {"created_at": {"$gte": watermark}},
+        {"updated_at": {"$gte": watermark}}
+    ]}
+
+async def refresh_search_index_async() -> None:
+    """Load new and changed courses into the search index (async)"""
+    global _search_synced_at
+    if not _search_index_stale():
+        return
+    cursor = courses_collection.find(_changed_since(course_search_index.watermark), SEARCH_FIELDS)
+    course_search_index.add_many(await cursor.to_list(length=None))
+    _search_synced_at = time.monotonic()
+
+def refresh_search_index_sync() -> None:
+    """Load new and changed courses into the search index (sync)"""
+    global _search_synced_at
+    if not _search_index_stale():
+        return
+    with _search_sync_lock:
+        if not _search_index_stale():
+            return
+        course_search_index.add_many(sync_courses_collection.find(_changed_since(course_search_index.watermark), SEARCH_FIELDS))
+        _search_synced_at = time.monotonic()
+
+def _order_by_ids(docs: List[dict], ids: List[ObjectId]) -> List[dict]:
+    by_id = {d["_id"]: d for d in docs}
+    return [by_id[i] for i in ids if i in by_id]
+
+async def search_courses_async(query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> Tuple[List[dict], int]:
+    """Search courses by title and description, best match first (async)"""
+    await refresh_search_index_async()
+    ids, total = course_search_index.search(query, offset, limit)
+    docs = await courses_collection.find({"_id": {"$in": ids}}).to_list(length=None) if ids else []
+    return _order_by_ids(docs, ids), total
+
+def search_courses_sync(query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> Tuple[List[dict], int]:
+    """Search courses by title and description, best match first (sync)"""
+    refresh_search_index_sync()
+    ids, total = course_search_index.search(query, offset, limit)
+    docs = list(sync_courses_collection.find({"_id": {"$in": ids}})) if ids else []
+    return _order_by_ids(docs, ids), total
+
+# ============ REDIRECT TABLE ============
+# /go/{slug} is the busiest route, so it is served from an in-process
+# slug -> udemy_link table (app/redirects.py) loaded at startup. Writes
+# through this module update it immediately; writes from other processes
+# are picked up by refresh_redirect_table_* on the same watermark scheme as
+# the search index, or by a projected lookup on a table miss or a stale entry.
+
+REDIRECT_FIELDS = {"slug": 1, "udemy_link": 1, "created_at": 1, "updated_at": 1}
+
+redirect_table = RedirectTable()
+
+async def get_redirect_link_async(slug: str) -> Optional[str]:
+    """Outbound link for a course slug; the database is only asked on a miss or a stale entry (async)"""
+    if redirect_table.needs_lookup(slug):
+        redirect_table.apply_lookup(slug, await courses_collection.find_one({"slug": slug}, REDIRECT_FIELDS))
+    return redirect_table.get(slug)
+
+def get_redirect_link_sync(slug: str) -> Optional[str]:
+    """Outbound link for a course slug; the database is only asked on a miss or a stale entry (sync)"""
+    if redirect_table.needs_lookup(slug):
+        redirect_table.apply_lookup(slug, sync_courses_collection.find_one({"slug": slug}, REDIRECT_FIELDS))
+    return redirect_table.get(slug)
+
+async def refresh_redirect_table_async() -> None:
+    """Load new and changed course links into the redirect table (async)"""
+    cursor = courses_collection.find(_changed_since(redirect_table.watermark), REDIRECT_FIELDS)
+    redirect_table.set_many(await cursor.to_list(length=None))
+    redirect_table.loaded = True
+
+def refresh_redirect_table_sync() -> None:
+    """Load new and changed course links into the redirect table (sync)"""
+    redirect_table.set_many(sync_courses_collection.find(_changed_since(redirect_table.watermark), REDIRECT_FIELDS))
+    redirect_table.loaded = True
+
+# ============ CARD QUERIES ============
+# List views only render a title, slug, short blurb and thumbnail. These
+# queries project exactly that on the server: descriptions are cut down to
+# an excerpt and inline base64 images are swapped for a URL that serves
+# them separately, so a page of cards stays a few KB per document.
+
+EXCERPT_LENGTH = 160
+
+def _excerpt_expr(field: str) -> dict:
+    # One character past the limit tells _finish_card whether to add an ellipsis
+    return {"$substrCP": [{"$ifNull": [f"${field}", ""]}, 0, EXCERPT_LENGTH + 1]}
+
+def _image_ref_expr(prefix: str) -> dict:
+    return {"$cond": [
+        {"$eq": [{"$substrCP": [{"$ifNull": ["$image", ""]}, 0, 5]}, "data:"]},
+        {"$concat": [prefix, "$slug"]},
+        "$image"
+    ]}
+
+COURSE_CARD_PROJECTION = {
+    "title": 1,
+    "slug": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "image_meta": 1,
+    "excerpt": _excerpt_expr("description"),
+    "image": _image_ref_expr("/image/course/")
+}
+
+POST_CARD_PROJECTION = {
+    "title": 1,
+    "slug": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "image_meta": 1,
+    "excerpt": _excerpt_expr("excerpt"),
+    "image": _image_ref_expr("/image/post/")
+}
+
+def _finish_card(doc: dict) -> dict:
+    excerpt = doc.get("excerpt") or ""
+    if len(excerpt) > EXCERPT_LENGTH:
+        doc["excerpt"] = excerpt[:EXCERPT_LENGTH].rstrip() + "…"
+    return doc
+
+def _card_pipeline(projection: dict, match: Optional[dict] = None, sort: Optional[dict] = None,
+                   limit: Optional[int] = None) -> List[dict]:
+    pipeline = [{"$match": match or {}}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": projection})
+    return pipeline
+
+_NEWEST_FIRST = {"created_at": -1, "_id": -1}
+
+async def get_course_cards_async(limit: Optional[int] = None) -> List[dict]:
+    """Get course cards, newest first (async)"""
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, sort=_NEWEST_FIRST, limit=limit)
+    docs = await courses_collection.aggregate(pipeline).to_list(length=None)
+    return [_finish_card(d) for d in docs]
+
+def get_course_cards_sync(limit: Optional[int] = None) -> List[dict]:
+    """Get course cards, newest first (sync)"""
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, sort=_NEWEST_FIRST, limit=limit)
+    return [_finish_card(d) for d in sync_courses_collection.aggregate(pipeline)]
+
+async def get_course_cards_page_async(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of course cards plus the cursor of the next page (async)"""
+    limit = _page_limit(limit)
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, _page_query(cursor), _NEWEST_FIRST, limit + 1)
+    docs = await courses_collection.aggregate(pipeline).to_list(length=limit + 1)
+    return _split_page([_finish_card(d) for d in docs], limit)
+
+def get_course_cards_page_sync(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of course cards plus the cursor of the next page (sync)"""
+    limit = _page_limit(limit)
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, _page_query(cursor), _NEWEST_FIRST, limit + 1)
+    docs = sync_courses_collection.aggregate(pipeline)
+    return _split_page([_finish_card(d) for d in docs], limit)
+
+async def search_course_cards_async(query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> Tuple[List[dict], int]:
+    """Search courses, returning one page of cards and the total match count (async)"""
+    await refresh_search_index_async()
+    ids, total = course_search_index.search(query, offset, limit)
+    if not ids:
+        return [], total
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, {"_id": {"$in": ids}})
+    docs = await courses_collection.aggregate(pipeline).to_list(length=None)
+    return [_finish_card(d) for d in _order_by_ids(docs, ids)], total
+
+def search_course_cards_sync(query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> Tuple[List[dict], int]:
+    """Search courses, returning one page of cards and the total match count (sync)"""
+    refresh_search_index_sync()
+    ids, total = course_search_index.search(query, offset, limit)
+    if not ids:
+        return [], total
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, {"_id": {"$in": ids}})
+    docs = sync_courses_collection.aggregate(pipeline)
+    return [_finish_card(d) for d in _order_by_ids(list(docs), ids)], total
+
+async def get_post_cards_async() -> List[dict]:
+    """Get blog post cards, newest first (async)"""
+    pipeline = _card_pipeline(POST_CARD_PROJECTION, sort=_NEWEST_FIRST)
+    docs = await blog_posts_collection.aggregate(pipeline).to_list(length=None)
+    return [_finish_card(d) for d in docs]
+
+def get_post_cards_sync() -> List[dict]:
+    """Get blog post cards, newest first (sync)"""
+    pipeline = _card_pipeline(POST_CARD_PROJECTION, sort=_NEWEST_FIRST)
+    return [_finish_card(d) for d in sync_blog_posts_collection.aggregate(pipeline)]
+
+async def get_course_image_async(slug: str) -> Optional[str]:
+    """Get only the image field of a course (async)"""
+    doc = await courses_collection.find_one({"slug": slug}, {"image": 1})
+    return doc.get("image") if doc else None
+
+def get_course_image_sync(slug: str) -> Optional[str]:
+    """Get only the image field of a course (sync)"""
+    doc = sync_courses_collection.find_one({"slug": slug}, {"image": 1})
+    return doc.get("image") if doc else None
+
+async def get_post_image_async(slug: str) -> Optional[str]:
+    """Get only the image field of a blog post (async)"""
+    doc = await blog_posts_collection.find_one({"slug": slug}, {"image": 1})
+    return doc.get("image") if doc else None
+
+def get_post_image_sync(slug: str) -> Optional[str]:
+    """Get only the image field of a blog post (sync)"""
+    doc = sync_blog_posts_collection.find_one({"slug": slug}, {"image": 1})
+    return doc.get("image") if doc else None
+
+# ============ TRENDING ============
+# trend_log holds log2 of a course's forward-decayed click score (see
+# app/trending.py), so adding a click is a log-add (app/scores.py) rather than an $inc.
+
+def _log_add_expr(field: str, value: float) -> dict:
+    """log_add(field, value) as an aggregation expression"""
+    return {"$cond": [
+        {"$eq": [{"$ifNull": [f"${field}", None]}, None]},
+        value,
+        {"$let": {
+            "vars": {"high": {"$max": [f"${field}", value]}, "low": {"$min": [f"${field}", value]}},
+            "in": {"$add": ["$$high", {"$log": [{"$add": [1, {"$pow": [2, {"$subtract": ["$$low", "$$high"]}]}]}, 2]}]}
+        }}
+    ]}
+
+def _click_updates(counts: dict) -> List[UpdateOne]:
+    """Build one pipeline update per course from {slug: (clicks, log2 of the score increment)}"""
+    return [
+        UpdateOne({"slug": slug}, [{"$set": {
+            "clicks": {"$add": [{"$ifNull": ["$clicks", 0]}, clicks]},
+            "trend_log": _log_add_expr("trend_log", score)
+        }}])
+        for slug, (clicks, score) in counts.items()
+    ]
+
+async def record_course_clicks_async(counts: dict) -> int:
+    """Apply batched click counts in a single bulk write (async)"""
+    if not counts:
+        return 0
+    result = await courses_collection.bulk_write(_click_updates(counts), ordered=False)
+    return result.modified_count
+
+def record_course_clicks_sync(counts: dict) -> int:
+    """Apply batched click counts in a single bulk write (sync)"""
+    if not counts:
+        return 0
+    result = sync_courses_collection.bulk_write(_click_updates(counts), ordered=False)
+    return result.modified_count
+
+_TRENDING_FIRST = {"trend_log": -1, "_id": -1}
+_TRENDING_MATCH = {"trend_log": {"$type": "number"}}
+
+async def get_trending_course_cards_async(limit: int) -> List[dict]:
+    """Get the highest-scoring course cards (async)"""
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, _TRENDING_MATCH, _TRENDING_FIRST, limit)
+    docs = await courses_collection.aggregate(pipeline).to_list(length=None)
+    return [_finish_card(d) for d in docs]
+
+def get_trending_course_cards_sync(limit: int) -> List[dict]:
+    """Get the highest-scoring course cards (sync)"""
+    pipeline = _card_pipeline(COURSE_CARD_PROJECTION, _TRENDING_MATCH, _TRENDING_FIRST, limit)
+    return [_finish_card(d) for d in sync_courses_collection.aggregate(pipeline)]
+
+# ============ SITEMAP QUERIES ============
+# Sitemaps only need a slug and a last-modified date per document. They are
+# read through projected cursors in _id order, and each chunk starts after a
+# known _id (keyset), so serving chunk N never walks the N - 1 before it.
+
+SITEMAP_FIELDS = {"_id": 1, "slug": 1, "created_at": 1, "updated_at": 1}
+_HAS_SLUG = {"slug": {"$nin": [None, ""]}}
+
+def _sitemap_collection(kind: str):
+    return {"courses": courses_collection, "posts": blog_posts_collection}[kind]
+
+def sitemap_chunk_bounds(ids: List[ObjectId], size: int) -> List[Optional[ObjectId]]:
+    """The _id each chunk of `size` sorted ids starts after; None for the first chunk"""
+    return [None] + ids[size - 1:-1:size]
+
+async def get_sitemap_chunk_bounds_async(kind: str, size: int) -> List[Optional[ObjectId]]:
+    """Chunk bounds for a sitemap, from one pass over the _ids of documents with a slug (async)"""
+    bounds, last = [None], None
+    cursor = _sitemap_collection(kind).find(_HAS_SLUG, {"_id": 1}).sort("_id", 1)
+    position = 0
+    async for doc in cursor:
+        if position and position % size == 0:
+            bounds.append(last)
+        last = doc["_id"]
+        position += 1
+    return bounds
+
+def iter_sitemap_entries_async(kind: str, after: Optional[ObjectId] = None, limit: int = 0):
+    """Async cursor over slug/date projections of the sitemap chunk that starts after an _id"""
+    query = {**_HAS_SLUG, "_id": {"$gt": after}} if after is not None else _HAS_SLUG
+    return _sitemap_collection(kind).find(query, SITEMAP_FIELDS).sort("_id", 1).limit(limit)
 
 # ============ BLOG POST OPERATIONS ============
 
@@ -214,11 +719,13 @@ async def create_post_async(post_data: dict) -> dict:
         "content": post_data.get("content"),
         "excerpt": post_data.get("excerpt"),
         "image": post_data.get("image"),
+        "image_meta": post_data.get("image_meta"),
         "is_published": post_data.get("is_published", True),
         "created_at": datetime.utcnow()
     }
     result = await blog_posts_collection.insert_one(post_doc)
     post_doc["_id"] = result.inserted_id
+    bump_catalog_version()
     return post_doc
 
 def create_post_sync(post_data: dict) -> dict:
@@ -230,11 +737,13 @@ def create_post_sync(post_data: dict) -> dict:
         "content": post_data.get("content"),
         "excerpt": post_data.get("excerpt"),
         "image": post_data.get("image"),
+        "image_meta": post_data.get("image_meta"),
         "is_published": post_data.get("is_published", True),
         "created_at": datetime.utcnow()
     }
     result = sync_blog_posts_collection.insert_one(post_doc)
     post_doc["_id"] = result.inserted_id
+    bump_catalog_version()
     return post_doc
 
 async def update_post_async(post_id: str, update_data: dict) -> bool:
@@ -244,6 +753,7 @@ async def update_post_async(post_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(post_id)},
         {"$set": update_data}
     )
+    bump_catalog_version()
     return result.modified_count > 0
 
 def update_post_sync(post_id: str, update_data: dict) -> bool:
@@ -253,16 +763,19 @@ def update_post_sync(post_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(post_id)},
         {"$set": update_data}
     )
+    bump_catalog_version()
     return result.modified_count > 0
 
 async def delete_post_async(post_id: str) -> bool:
     """Delete a blog post (async)"""
     result = await blog_posts_collection.delete_one({"_id": ObjectId(post_id)})
+    bump_catalog_version()
     return result.deleted_count > 0
 
 def delete_post_sync(post_id: str) -> bool:
     """Delete a blog post (sync)"""
     result = sync_blog_posts_collection.delete_one({"_id": ObjectId(post_id)})
+    bump_catalog_version()
     return result.deleted_count > 0
 
 # ============ PAGE OPERATIONS ============
@@ -302,6 +815,7 @@ async def create_page_async(page_data: dict) -> dict:
     }
     result = await pages_collection.insert_one(page_doc)
     page_doc["_id"] = result.inserted_id
+    bump_catalog_version()
     return page_doc
 
 def create_page_sync(page_data: dict) -> dict:
@@ -314,6 +828,7 @@ def create_page_sync(page_data: dict) -> dict:
     }
     result = sync_pages_collection.insert_one(page_doc)
     page_doc["_id"] = result.inserted_id
+    bump_catalog_version()
     return page_doc
 
 async def update_page_async(page_id: str, update_data: dict) -> bool:
@@ -323,6 +838,7 @@ async def update_page_async(page_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(page_id)},
         {"$set": update_data}
     )
+    bump_catalog_version()
     return result.modified_count > 0
 
 def update_page_sync(page_id: str, update_data: dict) -> bool:
@@ -332,14 +848,17 @@ def update_page_sync(page_id: str, update_data: dict) -> bool:
         {"_id": ObjectId(page_id)},
         {"$set": update_data}
     )
+    bump_catalog_version()
     return result.modified_count > 0
 
 async def delete_page_async(page_id: str) -> bool:
     """Delete a page (async)"""
     result = await pages_collection.delete_one({"_id": ObjectId(page_id)})
+    bump_catalog_version()
     return result.deleted_count > 0
 
 def delete_page_sync(page_id: str) -> bool:
     """Delete a page (sync)"""
     result = sync_pages_collection.delete_one({"_id": ObjectId(page_id)})
+    bump_catalog_version()
     return result.deleted_count > 0
@@ -1,48 +1,165 @@
+"""
+MongoDB clients and collections.
+
+Clients are created on first use rather than at import, so importing the
+app (or a script, or the local storage backends) never opens a connection.
+The async (Motor) and sync (pymongo) clients are built from the same
+settings:
+
+    MONGODB_URL                         connection string
+    DATABASE_NAME                       database (default: sucourse_db)
+    MONGO_MAX_POOL_SIZE                 connections per client (default: 20)
+    MONGO_MIN_POOL_SIZE                 connections kept open (default: 0)
+    MONGO_MAX_IDLE_TIME_MS              close idle connections after (default: 300000)
+    MONGO_CONNECT_TIMEOUT_MS            TCP/TLS connect timeout (default: 10000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   wait for a usable server (default: 10000)
+    MONGO_SOCKET_TIMEOUT_MS             per-operation socket timeout, 0 = none (default: 0)
+
+The module-level collections are proxies that resolve to the real collection
+on first attribute access, so `from .database_mongo import courses_collection`
+keeps working.
+"""
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+import asyncio
 import os
-from dotenv import load_dotenv
+import threading
+import time
 import certifi
+from dotenv import load_dotenv
+
+from .metrics import db_command_listener
 
+# Loaded here as well as in main.py: media, crud_mongo and the scripts import
+# this module before they read their settings from the environment
 load_dotenv()
 
-# MongoDB Configuration
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "sucourse_db")
+_async_client = None
+_sync_client = None
+_client_lock = threading.Lock()
+
+def database_name() -> str:
+    return os.getenv("DATABASE_NAME", "sucourse_db")
+
+def client_options() -> dict:
+    """Connection settings shared by the async and sync clients"""
+    options = {
+        "tlsCAFile": certifi.where(),
+        "appname": "sucourse-web",
+        "event_listeners": [db_command_listener],
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+    }
+    socket_timeout = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))
+    if socket_timeout:
+        options["socketTimeoutMS"] = socket_timeout
+    return options
 
-# Async MongoDB client (for async operations)
-async_client = AsyncIOMotorClient(MONGODB_URL, tlsCAFile=certifi.where())
-async_db = async_client[DATABASE_NAME]
+def get_async_client() -> AsyncIOMotorClient:
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"),
+                                               **client_options())
+        return _async_client
 
-# Sync MongoDB client (for sync operations)
-sync_client = MongoClient(MONGODB_URL, tlsCAFile=certifi.where())
-sync_db = sync_client[DATABASE_NAME]
+def get_sync_client() -> MongoClient:
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None:
+            _sync_client = MongoClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"),
+                                       **client_options())
+        return _sync_client
+
+def get_async_db():
+    return get_async_client()[database_name()]
+
+def get_sync_db():
+    return get_sync_client()[database_name()]
+
+class LazyCollection:
+    """Stands in for a collection until it is first used"""
+
+    def __init__(self, get_db, name: str):
+        self._get_db = get_db
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._get_db()[self._name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
 
 # Collections
-courses_collection = async_db["courses"]
-blog_posts_collection = async_db["blog_posts"]
-pages_collection = async_db["pages"]
+courses_collection = LazyCollection(get_async_db, "courses")
+blog_posts_collection = LazyCollection(get_async_db, "blog_posts")
+pages_collection = LazyCollection(get_async_db, "pages")
 
 # Sync collections (for non-async operations)
-sync_courses_collection = sync_db["courses"]
-sync_blog_posts_collection = sync_db["blog_posts"]
-sync_pages_collection = sync_db["pages"]
+sync_courses_collection = LazyCollection(get_sync_db, "courses")
+sync_blog_posts_collection = LazyCollection(get_sync_db, "blog_posts")
+sync_pages_collection = LazyCollection(get_sync_db, "pages")
+
+# Declared indexes per collection; init_db only builds the ones that are missing or changed
+INDEXES = {
+    "courses": [
+        IndexModel([("slug", ASCENDING)], unique=True),
+        IndexModel([("title", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),
+        IndexModel([("trend_log", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "blog_posts": [
+        IndexModel([("slug", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "pages": [
+        IndexModel([("slug", ASCENDING)], unique=True),
+    ],
+}
+
+def _index_matches(model: IndexModel, existing: dict) -> bool:
+    declared = model.document
+    return (list(declared["key"].items()) == [tuple(k) for k in existing.get("key", [])]
+            and bool(declared.get("unique")) == bool(existing.get("unique")))
+
+async def _sync_indexes(collection, models) -> int:
+    """Create the declared indexes that are missing or differ, return how many were built"""
+    existing = await collection.index_information()
+    pending = []
+    for model in models:
+        name = model.document["name"]
+        if name in existing and _index_matches(model, existing[name]):
+            continue
+        if name in existing:
+            await collection.drop_index(name)
+        pending.append(model)
+    if pending:
+        await collection.create_indexes(pending)
+    return len(pending)
 
 async def init_db():
     """Initialize database indexes"""
-    # Create indexes for better query performance
-    await courses_collection.create_index("slug", unique=True)
-    await courses_collection.create_index("title")
-    await courses_collection.create_index("created_at")
-    
-    await blog_posts_collection.create_index("slug", unique=True)
-    await blog_posts_collection.create_index("created_at")
-    
-    await pages_collection.create_index("slug", unique=True)
-    
-    print("✅ MongoDB indexes created successfully")
+    started = time.perf_counter()
+    db = get_async_db()
+    built = await asyncio.gather(*(_sync_indexes(db[name], models) for name, models in INDEXES.items()))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if sum(built):
+        print(f"✅ MongoDB indexes ready, {sum(built)} built ({elapsed_ms:.0f} ms)")
+    else:
+        print(f"✅ MongoDB indexes up to date ({elapsed_ms:.0f} ms)")
 
 async def close_db():
     """Close database connections"""
-    async_client.close()
-    sync_client.close()
+    global _async_client, _sync_client
+    with _client_lock:
+        if _async_client is not None:
+            _async_client.close()
+        if _sync_client is not None:
+            _sync_client.close()
+        _async_client = _sync_client = None
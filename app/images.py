@@ -0,0 +1,90 @@
+"""
+Image processing for course and blog images.
+
+When an image enters the system it is stored in the media store as-is and
+a set of downscaled card variants is generated alongside it:
+
+    - JPEG, WebP and (when Pillow supports it) AVIF at CARD_WIDTHS
+    - a tiny blurred JPEG placeholder (LQIP) inlined as a data: URI
+
+The resulting metadata is saved on the document as `image_meta` and used by
+the card templates to emit <picture>/srcset markup.
+"""
+
+import base64
+import io
+from typing import Optional, Tuple
+
+from PIL import Image, ImageFilter, UnidentifiedImageError, features
+
+from .media import decode_data_uri, store_bytes
+
+CARD_WIDTHS = (320, 480, 640)
+DEFAULT_WIDTH = 480
+LQIP_WIDTH = 16
+
+# Browsers pick the first <source> they support, so the smallest format goes first
+FORMATS = [
+    ("image/avif", "AVIF", {"quality": 50}),
+    ("image/webp", "WEBP", {"quality": 75, "method": 4}),
+]
+JPEG_OPTIONS = {"quality": 80, "optimize": True, "progressive": True}
+
+def _supported_formats():
+    return [f for f in FORMATS if features.check(f[1].lower())]
+
+def _encode(img: Image.Image, fmt: str, options: dict) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+def _resize(img: Image.Image, width: int) -> Image.Image:
+    if img.width <= width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.LANCZOS)
+
+def _lqip(img: Image.Image) -> str:
+    tiny = _resize(img, LQIP_WIDTH).filter(ImageFilter.GaussianBlur(1))
+    data = _encode(tiny, "JPEG", {"quality": 40})
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+
+def build_variants(data: bytes) -> Optional[dict]:
+    """Generate card variants for raw image bytes, or None if they are not an image"""
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except (UnidentifiedImageError, OSError):
+        return None
+    img = img.convert("RGB")
+
+    # Never upscale: widths above the original collapse into the original size
+    widths = sorted({min(w, img.width) for w in CARD_WIDTHS})
+    resized = {w: _resize(img, w) for w in widths}
+
+    jpeg = {w: store_bytes(_encode(resized[w], "JPEG", JPEG_OPTIONS)) for w in widths}
+    sources = []
+    for content_type, fmt, options in _supported_formats():
+        srcset = ", ".join(f"{store_bytes(_encode(resized[w], fmt, options))} {w}w" for w in widths)
+        sources.append({"type": content_type, "srcset": srcset})
+
+    default = min(widths, key=lambda w: abs(w - DEFAULT_WIDTH))
+    return {
+        "src": jpeg[default],
+        "srcset": ", ".join(f"{jpeg[w]} {w}w" for w in widths),
+        "sources": sources,
+        "width": resized[default].width,
+        "height": resized[default].height,
+        "lqip": _lqip(img)
+    }
+
+def ingest_image_bytes(data: bytes) -> Tuple[str, Optional[dict]]:
+    """Store an original image and its variants, returning (url, image_meta)"""
+    return store_bytes(data), build_variants(data)
+
+def ingest_image(image: Optional[str]) -> Tuple[Optional[str], Optional[dict]]:
+    """Ingest an inline data: URI; other image references pass through untouched"""
+    data = decode_data_uri(image)
+    if data is None:
+        return image, None
+    return ingest_image_bytes(data)
@@ -1,54 +1,119 @@
 from fastapi import FastAPI, HTTPException, Form, File, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from starlette.requests import Request
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
 import os
+import secrets
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
-import shutil
 from bson import ObjectId
-
-from .database_mongo import init_db, close_db
-from .crud_mongo import (
-    slugify,
-    # Course operations
-    create_course_sync, get_courses_sync, get_course_sync, 
-    get_course_by_id_sync, update_course_sync, delete_course_sync,
-    delete_courses_by_days_sync,
-    search_courses_sync,
-    # Blog operations
-    get_posts_sync, get_post_sync, get_post_by_id_sync,
-    create_post_sync, update_post_sync, delete_post_sync,
-    # Page operations
-    get_pages_sync, get_page_sync, get_page_by_id_sync,
-    create_page_sync, update_page_sync
-)
-from .schemas import CourseCreate
+from pydantic import ValidationError
 from dotenv import load_dotenv
 
+# Before the app modules: several read their settings at import
 load_dotenv()
 
+from .media import media_store, is_valid_hash, decode_data_uri, sniff_content_type
+from .images import ingest_image, ingest_image_bytes
+from .cache import PageCache, FragmentCache
+from .metrics import MetricsMiddleware, render as render_metrics
+from .compression import CompressionMiddleware
+from .assets import AssetManifest, AssetStaticFiles
+from .trending import TrendingTracker
+from .sitemap import (
+    build_index as build_sitemap_index, is_valid_child as is_valid_sitemap,
+    cached_child as cached_sitemap, stream_child as stream_sitemap
+)
+from .repository import repository
+from .redirects import REDIRECT_REFRESH_SECONDS
+from .crud_mongo import slugify, catalog_version, SEARCH_PAGE_SIZE, MAX_BULK_COURSES
+from .schemas import CourseCreate
+
 app = FastAPI()
-templates = Jinja2Templates(directory="app/templates")
+# Added first so it runs inside MetricsMiddleware, which then records bytes on the wire
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "500")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+)
+app.add_middleware(MetricsMiddleware)
+# Templates are compiled once per process and the bytecode is kept on disk
+# across restarts. Set TEMPLATE_AUTO_RELOAD=1 in development to pick up
+# template edits without restarting; production skips the mtime checks.
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader("app/templates"),
+    autoescape=True,
+    auto_reload=os.getenv("TEMPLATE_AUTO_RELOAD", "0") == "1",
+    bytecode_cache=FileSystemBytecodeCache(os.getenv("TEMPLATE_CACHE_DIR") or None)
+))
+
+# style.css is linked as /static/style.<hash>.css and cached for a year
+assets = AssetManifest("app/static", "app/asset-manifest.json")
+app.mount("/static", AssetStaticFiles(directory="app/static", manifest=assets), name="static")
+
+# Rendered-page cache for public routes. Disable individual routes by name,
+# e.g. PAGE_CACHE_DISABLED=home,blog_post
+page_cache = PageCache(
+    version=catalog_version,
+    maxsize=int(os.getenv("PAGE_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("PAGE_CACHE_TTL", "60")),
+    disabled=tuple(n.strip() for n in os.getenv("PAGE_CACHE_DISABLED", "").split(",") if n.strip())
+)
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# "Most Popular Courses" on the home page, ranked by decayed /go click counts
+trending = TrendingTracker(
+    flush_interval=float(os.getenv("TRENDING_FLUSH_SECONDS", "30")),
+    size=int(os.getenv("TRENDING_SIZE", "8")),
+    half_life_hours=float(os.getenv("TRENDING_HALF_LIFE_HOURS", "72"))
+)
+
+# Rendered course cards, keyed on id and updated_at so an edited course re-renders
+card_cache = FragmentCache(
+    templates.env, "macros/cards.html", "course_card",
+    maxsize=int(os.getenv("CARD_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("CARD_CACHE_TTL", "3600"))
+)
+
+def course_card(course: dict, variant: str = "grid"):
+    stamp = course.get("updated_at") or course.get("created_at")
+    key = (variant, course["id"], stamp) if course.get("id") and stamp else None
+    return card_cache.render(key, course, variant)
 
-# Ensure image directory exists
-os.makedirs("app/static/images", exist_ok=True)
+templates.env.globals["course_card"] = course_card
+templates.env.globals["static_url"] = assets.url
+
+async def refresh_redirects_periodically():
+    """Pick up course links written by other processes"""
+    while True:
+        await asyncio.sleep(REDIRECT_REFRESH_SECONDS)
+        try:
+            await repository.refresh_redirect_table()
+        except Exception as e:
+            print(f"⚠️ Redirect table refresh failed: {e}")
 
-# Initialize MongoDB on startup
+# Initialize storage on startup
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
-    print("✅ MongoDB connected and initialized")
+    started = time.perf_counter()
+    await repository.init()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"✅ {type(repository).__name__} initialized in {elapsed_ms:.0f} ms, search index and redirect table loaded")
+    asyncio.create_task(refresh_redirects_periodically())
+    await trending.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    await close_db()
-    print("👋 MongoDB connection closed")
+    await trending.stop()
+    await repository.close()
+    print("👋 Storage connection closed")
 
 # Helper function to convert MongoDB ObjectId to string
 def serialize_doc(doc):
@@ -70,19 +135,48 @@ def serialize_doc(doc):
     
     return doc
 
+def data_uri_response(data_uri: Optional[str]) -> Response:
+    """Serve an inline data: URI image as raw bytes"""
+    content = decode_data_uri(data_uri)
+    if content is None:
+        # Pages cached before migrate_media.py moved the image still link here
+        if data_uri and not data_uri.startswith("data:"):
+            return RedirectResponse(assets.url(data_uri), status_code=302, headers={
+                "Cache-Control": "public, max-age=3600"
+            })
+        raise HTTPException(status_code=404)
+    return Response(content=content, media_type=sniff_content_type(content), headers={
+        "Cache-Control": "public, max-age=3600"
+    })
+
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Media storage (GridFS/disk) and image resizing are blocking, so they run
+# in the threadpool rather than on the event loop.
+async def ingest_form_image(upload: UploadFile):
+    """Store an uploaded image and its variants, returning (url, image_meta)"""
+    return await run_in_threadpool(ingest_image_bytes, await upload.read())
+
 # API
+async def api_course_data(course: CourseCreate) -> dict:
+    """Map an API payload to course fields, ingesting any inline image"""
+    course_data = {
+        "title": course.title,
+        "description": course.description,
+        "rating": course.rating,
+        "instructor": course.instructor,
+        "udemy_link": course.udemy_link
+    }
+    course_data["image"], course_data["image_meta"] = course.image, None
+    if course.image and course.image.startswith("data:"):
+        # Decoding and resizing is CPU-bound; keep it off the event loop
+        course_data["image"], course_data["image_meta"] = await run_in_threadpool(ingest_image, course.image)
+    return course_data
+
 @app.post("/api/courses")
-def add_course(course: CourseCreate):
+async def add_course(course: CourseCreate):
     try:
-        course_data = {
-            "title": course.title,
-            "description": course.description,
-            "rating": course.rating,
-            "instructor": course.instructor,
-            "image": course.image,
-            "udemy_link": course.udemy_link
-        }
-        result = create_course_sync(course_data)
+        result = await repository.create_course(await api_course_data(course))
         return serialize_doc(result)
     except Exception as e:
         print(f"❌ API ERROR: {e}")
@@ -90,13 +184,52 @@ def add_course(course: CourseCreate):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_bulk_body(body: bytes, content_type: str) -> list:
+    """Accept a JSON array, or NDJSON with one course object per line"""
+    if "ndjson" in content_type or not body.lstrip().startswith(b"["):
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of courses")
+    return items
+
+@app.post("/api/courses/bulk")
+async def add_courses_bulk(request: Request):
+    try:
+        items = parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid body: {e}")
+    if len(items) > MAX_BULK_COURSES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_COURSES} courses per request")
+
+    # Validate every item up front; invalid ones are reported, not fatal
+    valid, invalid = [], {}
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Expected a JSON object")
+            valid.append((i, CourseCreate(**item)))
+        except (ValidationError, ValueError) as e:
+            errors = e.errors() if isinstance(e, ValidationError) else [{"msg": str(e)}]
+            invalid[i] = "; ".join(err["msg"] for err in errors)
+
+    course_data = await asyncio.gather(*(api_course_data(course) for _, course in valid))
+    written = await repository.upsert_courses(list(course_data))
+
+    results = [{"index": i, "status": "error", "error": error} for i, error in invalid.items()]
+    for (i, _), result in zip(valid, written):
+        results.append({**result, "index": i})
+    results.sort(key=lambda r: r["index"])
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "updated", "error")}
+    return {**summary, "results": results}
+
 @app.get("/health")
 @app.head("/health")
-def health():
+async def health():
     return {"status": "healthy"}
 
 @app.get("/robots.txt", response_class=PlainTextResponse)
-def robots_txt(request: Request):
+async def robots_txt(request: Request):
     base_url = str(request.base_url).rstrip("/")
     return f"""User-agent: *
 Disallow: /admin
@@ -106,79 +239,42 @@ Sitemap: {base_url}/sitemap.xml
 """
 
 @app.get("/sitemap.xml")
-def sitemap_xml(request: Request):
+async def sitemap_xml(request: Request):
     base_url = str(request.base_url).rstrip("/")
-    
-    xml = """<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-"""
-    # Static pages
-    for path in ["", "/about", "/contact", "/privacy", "/blog", "/courses"]:
-        xml += f"""
-    <url>
-        <loc>{base_url}{path}</loc>
-        <changefreq>daily</changefreq>
-        <priority>0.8</priority>
-    </url>"""
-
-    # Courses
-    courses = get_courses_sync()
-    for c in courses:
-        if c.get("slug"):
-            created_at = c.get("created_at")
-            lastmod = created_at.strftime('%Y-%m-%d') if created_at else ""
-            xml += f"""
-    <url>
-        <loc>{base_url}/course/{c['slug']}</loc>
-        <lastmod>{lastmod}</lastmod>
-        <changefreq>daily</changefreq>
-        <priority>1.0</priority>
-    </url>"""
-
-    # Blog Posts
-    posts = get_posts_sync()
-    for p in posts:
-        if p.get("slug"):
-            created_at = p.get("created_at")
-            lastmod = created_at.strftime('%Y-%m-%d') if created_at else ""
-            xml += f"""
-    <url>
-        <loc>{base_url}/blog/{p['slug']}</loc>
-        <lastmod>{lastmod}</lastmod>
-        <changefreq>weekly</changefreq>
-        <priority>0.7</priority>
-    </url>"""
-
-    xml += "\n</urlset>"
-    return Response(content=xml, media_type="application/xml")
+    return Response(content=await build_sitemap_index(base_url), media_type="application/xml")
+
+@app.get("/sitemaps/{kind}-{number}.xml.gz")
+async def sitemap_child(kind: str, number: int, request: Request):
+    if not is_valid_sitemap(kind, number):
+        raise HTTPException(status_code=404)
+    base_url = str(request.base_url).rstrip("/")
+    cached = cached_sitemap(base_url, kind, number)
+    if cached is not None:
+        return Response(content=cached, media_type="application/gzip")
+    return StreamingResponse(stream_sitemap(base_url, kind, number), media_type="application/gzip")
 
 # Pages
 @app.get("/", response_class=HTMLResponse)
 @app.head("/", response_class=HTMLResponse)
-def home(request: Request):
-    courses = get_courses_sync()
-    page = get_page_sync("home")
-    
-    # Popular Courses Logic - search for courses with specific keywords
-    keywords = ["java", "python", "ai", "web"]
-    popular_courses = []
-    for course in courses:
-        title_lower = course.get("title", "").lower()
-        if any(keyword in title_lower for keyword in keywords):
-            popular_courses.append(course)
-            if len(popular_courses) >= 8:
-                break
+@page_cache.cached("home")
+async def home(request: Request):
+    (courses, next_cursor), page = await asyncio.gather(
+        repository.get_course_cards_page(),
+        repository.get_page("home")
+    )
     
     return templates.TemplateResponse("index.html", {
         "request": request,
         "courses": serialize_doc(courses),
-        "popular_courses": serialize_doc(popular_courses),
+        "popular_courses": serialize_doc(trending.top()),
+        "next_cursor": next_cursor,
         "page": serialize_doc(page)
     })
 
 @app.get("/course/{slug}", response_class=HTMLResponse)
-def course_page(slug: str, request: Request):
-    course = get_course_sync(slug)
+@page_cache.cached("course_page")
+async def course_page(slug: str, request: Request):
+    course = await repository.get_course(slug)
     if not course:
         raise HTTPException(status_code=404)
     return templates.TemplateResponse("course.html", {
@@ -186,44 +282,74 @@ def course_page(slug: str, request: Request):
         "course": serialize_doc(course)
     })
 
-@app.get("/go/{slug}")
-def redirect_to_udemy(slug: str):
-    course = get_course_sync(slug)
-    print("DEBUG COURSE:", course)
-    
-    if not course:
-        return {"detail": "Course not found"}
-        
-    udemy_link = course.get("udemy_link")
-    print("DEBUG SOURCE LINK:", udemy_link)
+@app.get("/media/{digest}")
+async def media_file(digest: str, request: Request):
+    if not is_valid_hash(digest):
+        raise HTTPException(status_code=404)
+    # The URL is the content hash, so a matching ETag never needs a lookup
+    etag = f'"{digest}"'
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    found = await run_in_threadpool(media_store.get, digest)
+    if not found:
+        raise HTTPException(status_code=404)
+    content, media_type = found
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/image/course/{slug}")
+async def course_image(slug: str):
+    return data_uri_response(await repository.get_course_image(slug))
+
+@app.get("/image/post/{slug}")
+async def post_image(slug: str):
+    return data_uri_response(await repository.get_post_image(slug))
 
+@app.get("/go/{slug}")
+async def redirect_to_udemy(slug: str):
+    # Served from the in-process redirect table; only unknown slugs reach the database
+    udemy_link = await repository.get_redirect_link(slug)
     if not udemy_link:
-        return {"detail": "Course link not found"}
+        return {"detail": "Course not found"}
 
-    return RedirectResponse(udemy_link)
+    trending.record(slug)
+    return RedirectResponse(udemy_link, status_code=302)
 
 @app.get("/courses", response_class=HTMLResponse)
-def all_courses(request: Request):
-    courses = get_courses_sync()
+@page_cache.cached("all_courses")
+async def all_courses(request: Request, cursor: Optional[str] = None):
+    courses, next_cursor = await repository.get_course_cards_page(cursor)
     return templates.TemplateResponse("courses.html", {
         "request": request,
         "courses": serialize_doc(courses),
+        "cursor": cursor,
+        "next_cursor": next_cursor,
         "title": "All Courses - SU Course"
     })
 
 @app.get("/search", response_class=HTMLResponse)
-def search(request: Request, q: str = ""):
-    courses = []
+async def search(request: Request, q: str = "", page: int = 1):
+    courses, total = [], 0
+    page = max(page, 1)
     if q:
-        courses = search_courses_sync(q)
+        courses, total = await repository.search_course_cards(q, (page - 1) * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE)
     return templates.TemplateResponse(
         "search.html",
-        {"request": request, "courses": serialize_doc(courses), "query": q, "title": f"Search: {q}"}
+        {
+            "request": request,
+            "courses": serialize_doc(courses),
+            "query": q,
+            "page": page,
+            "total": total,
+            "has_next": page * SEARCH_PAGE_SIZE < total,
+            "title": f"Search: {q}"
+        }
     )
 
 @app.get("/about", response_class=HTMLResponse)
-def about(request: Request):
-    page = get_page_sync("about")
+@page_cache.cached("about")
+async def about(request: Request):
+    page = await repository.get_page("about")
     return templates.TemplateResponse("about.html", {
         "request": request, 
         "page": serialize_doc(page), 
@@ -231,8 +357,9 @@ def about(request: Request):
     })
 
 @app.get("/blog", response_class=HTMLResponse)
-def blog(request: Request):
-    posts = get_posts_sync()
+@page_cache.cached("blog")
+async def blog(request: Request):
+    posts = await repository.get_post_cards()
     return templates.TemplateResponse("blog.html", {
         "request": request, 
         "posts": serialize_doc(posts), 
@@ -240,8 +367,9 @@ def blog(request: Request):
     })
 
 @app.get("/blog/{slug}", response_class=HTMLResponse)
-def blog_post(slug: str, request: Request):
-    post = get_post_sync(slug)
+@page_cache.cached("blog_post")
+async def blog_post(slug: str, request: Request):
+    post = await repository.get_post(slug)
     if not post: 
         raise HTTPException(404)
     return templates.TemplateResponse("blog_post.html", {
@@ -251,14 +379,31 @@ def blog_post(slug: str, request: Request):
     })
 
 @app.get("/contact", response_class=HTMLResponse)
-def contact(request: Request):
-    page = get_page_sync("contact")
+@page_cache.cached("contact")
+async def contact(request: Request):
+    page = await repository.get_page("contact")
     return templates.TemplateResponse("contact.html", {
         "request": request, 
         "page": serialize_doc(page), 
         "title": "Contact Us - SU Course"
     })
 
+def send_contact_email(smtp_user: str, smtp_pass: str, name: str, email: str, message: str):
+    msg = MIMEMultipart()
+    msg['From'] = smtp_user
+    msg['To'] = "sucourse@zohomail.in"
+    msg['Subject'] = f"New Contact from {name}"
+    
+    body = f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
+    msg.attach(MIMEText(body, 'plain'))
+    
+    server = smtplib.SMTP("smtp.zoho.in", 587)
+    server.starttls()
+    server.login(smtp_user, smtp_pass)
+    text = msg.as_string()
+    server.sendmail(smtp_user, "sucourse@zohomail.in", text)
+    server.quit()
+
 @app.post("/contact", response_class=HTMLResponse)
 async def contact_post(
     request: Request, 
@@ -275,21 +420,8 @@ async def contact_post(
     
     if smtp_user and smtp_pass:
         try:
-            msg = MIMEMultipart()
-            msg['From'] = smtp_user
-            msg['To'] = "sucourse@zohomail.in"
-            msg['Subject'] = f"New Contact from {name}"
-            
-            body = f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
-            msg.attach(MIMEText(body, 'plain'))
-            
-            server = smtplib.SMTP("smtp.zoho.in", 587)
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            text = msg.as_string()
-            server.sendmail(smtp_user, "sucourse@zohomail.in", text)
-            server.quit()
-            
+            # smtplib blocks for the whole SMTP conversation
+            await run_in_threadpool(send_contact_email, smtp_user, smtp_pass, name, email, message)
             success_msg += " (Email Sent)"
             print("✅ Email sent successfully via Zoho SMTP")
         except Exception as e:
@@ -298,7 +430,7 @@ async def contact_post(
     else:
        print(f"--- START MESSAGE ---\nFrom: {name} <{email}>\n{message}\n--- END MESSAGE ---")
 
-    page = get_page_sync("contact")
+    page = await repository.get_page("contact")
     return templates.TemplateResponse("contact.html", {
         "request": request, 
         "page": serialize_doc(page), 
@@ -307,8 +439,9 @@ async def contact_post(
     })
 
 @app.get("/privacy", response_class=HTMLResponse)
-def privacy(request: Request):
-    page = get_page_sync("privacy")
+@page_cache.cached("privacy")
+async def privacy(request: Request):
+    page = await repository.get_page("privacy")
     return templates.TemplateResponse("privacy.html", {
         "request": request, 
         "page": serialize_doc(page), 
@@ -319,17 +452,17 @@ def privacy(request: Request):
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "adminpass123")
 print(f"🔑 ADMIN PASSWORD ACTIVE: {ADMIN_PASSWORD}")
 
-def admin_auth(request: Request):
+async def admin_auth(request: Request):
     password = request.cookies.get("admin_pass")
     if password != ADMIN_PASSWORD:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 @app.get("/admin/login", response_class=HTMLResponse)
-def admin_login(request: Request):
+async def admin_login(request: Request):
     return templates.TemplateResponse("admin/login.html", {"request": request})
 
 @app.post("/admin/login")
-def admin_login_post(request: Request, password: str = Form(...)):
+async def admin_login_post(request: Request, password: str = Form(...)):
     if password == ADMIN_PASSWORD:
         response = RedirectResponse("/admin", status_code=302)
         response.set_cookie("admin_pass", password, httponly=True)
@@ -339,15 +472,42 @@ def admin_login_post(request: Request, password: str = Form(...)):
 from fastapi import Depends
 
 @app.get("/admin", response_class=HTMLResponse, dependencies=[Depends(admin_auth)])
-def admin_dashboard(request: Request):
-    courses = get_courses_sync()
+async def admin_dashboard(request: Request):
+    courses = await repository.get_course_cards()
     return templates.TemplateResponse(
         "admin/dashboard.html",
         {"request": request, "courses": serialize_doc(courses)}
     )
 
+@app.get("/admin/stats", dependencies=[Depends(admin_auth)])
+async def admin_stats():
+    return {
+        **repository.cache_stats(),
+        "page_cache": page_cache.stats(),
+        "card_cache": card_cache.stats(),
+        "trending": trending.stats()
+    }
+
+# Prometheus can't log in, so /metrics also accepts "Authorization: Bearer $METRICS_TOKEN"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+async def metrics_auth(request: Request):
+    if METRICS_TOKEN and secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return
+    await admin_auth(request)
+
+@app.get("/metrics", dependencies=[Depends(metrics_auth)])
+async def metrics():
+    body = render_metrics({
+        **repository.cache_stats(),
+        "page_cache": page_cache.stats(),
+        "card_cache": card_cache.stats(),
+        "trending": trending.stats()
+    })
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/admin/new", response_class=HTMLResponse, dependencies=[Depends(admin_auth)])
-def admin_new_course(request: Request):
+async def admin_new_course(request: Request):
     return templates.TemplateResponse("admin/form.html", {"request": request, "course": None})
 
 @app.post("/admin/new", dependencies=[Depends(admin_auth)])
@@ -367,21 +527,14 @@ async def admin_create_course(
     
     # Handle Image Upload
     if image_file and image_file.filename:
-        extension = os.path.splitext(image_file.filename)[1] or ".jpg"
-        file_name = f"{slug}{extension}"
-        file_path = f"app/static/images/{file_name}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image_file.file, buffer)
-            
-        course_data["image"] = f"/static/images/{file_name}"
+        course_data["image"], course_data["image_meta"] = await ingest_form_image(image_file)
 
-    create_course_sync(course_data)
+    await repository.create_course(course_data)
     return RedirectResponse("/admin", status_code=302)
 
 @app.get("/admin/edit/{id}", response_class=HTMLResponse, dependencies=[Depends(admin_auth)])
-def admin_edit_course(id: str, request: Request):
-    course = get_course_by_id_sync(id)
+async def admin_edit_course(id: str, request: Request):
+    course = await repository.get_course_by_id(id)
     return templates.TemplateResponse(
         "admin/form.html",
         {"request": request, "course": serialize_doc(course)}
@@ -396,7 +549,6 @@ async def admin_update_course(
     image_file: UploadFile = File(None),
     delete_image: bool = Form(False)
 ):
-    course = get_course_by_id_sync(id)
     update_data = {
         "title": title,
         "description": description,
@@ -406,33 +558,26 @@ async def admin_update_course(
     # Handle Image Deletion
     if delete_image:
         update_data["image"] = None
+        update_data["image_meta"] = None
         
     # Handle Image Replacement
     if image_file and image_file.filename:
-        slug = course.get("slug") or slugify(title)
-        extension = os.path.splitext(image_file.filename)[1] or ".jpg"
-        file_name = f"{slug}{extension}"
-        file_path = f"app/static/images/{file_name}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image_file.file, buffer)
-            
-        update_data["image"] = f"/static/images/{file_name}"
+        update_data["image"], update_data["image_meta"] = await ingest_form_image(image_file)
 
-    update_course_sync(id, update_data)
+    await repository.update_course(id, update_data)
     return RedirectResponse("/admin", status_code=302)
 
 @app.get("/admin/delete/{id}", dependencies=[Depends(admin_auth)])
-def admin_delete_course(id: str):
-    delete_course_sync(id)
+async def admin_delete_course(id: str):
+    await repository.delete_course(id)
     return RedirectResponse("/admin", status_code=302)
 
 @app.delete("/admin/delete-days/{days}", dependencies=[Depends(admin_auth)])
-def delete_courses_by_days(days: int):
+async def delete_courses_by_days(days: int):
     if days not in [5, 10, 20]:
         return {"error": "Invalid range"}
 
-    deleted_count = delete_courses_by_days_sync(days)
+    deleted_count = await repository.delete_courses_by_days(days)
 
     return {
         "status": "success",
@@ -443,7 +588,7 @@ def delete_courses_by_days(days: int):
 # --- Admin Blog ---
 @app.get("/admin/blog", dependencies=[Depends(admin_auth)])
 async def admin_blog_list(request: Request):
-    posts = get_posts_sync()
+    posts = await repository.get_post_cards()
     return templates.TemplateResponse("admin/blog_list.html", {
         "request": request, 
         "posts": serialize_doc(posts)
@@ -469,19 +614,14 @@ async def admin_blog_create(
     }
     
     if image_file and image_file.filename:
-        extension = os.path.splitext(image_file.filename)[1] or ".jpg"
-        file_name = f"blog-{slug}{extension}"
-        file_path = f"app/static/images/{file_name}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image_file.file, buffer)
-        post_data["image"] = f"/static/images/{file_name}"
-
-    create_post_sync(post_data)
+        post_data["image"], post_data["image_meta"] = await ingest_form_image(image_file)
+
+    await repository.create_post(post_data)
     return RedirectResponse("/admin/blog", status_code=302)
 
 @app.get("/admin/blog/edit/{id}", dependencies=[Depends(admin_auth)])
 async def admin_blog_edit(request: Request, id: str):
-    post = get_post_by_id_sync(id)
+    post = await repository.get_post_by_id(id)
     if not post: 
         raise HTTPException(404)
     return templates.TemplateResponse("admin/blog_form.html", {
@@ -498,7 +638,7 @@ async def admin_blog_update(
     image_file: UploadFile = File(None),
     delete_image: bool = Form(False)
 ):
-    post = get_post_by_id_sync(id)
+    post = await repository.get_post_by_id(id)
     if not post: 
         raise HTTPException(404)
     
@@ -510,38 +650,34 @@ async def admin_blog_update(
 
     if delete_image:
         update_data["image"] = None
+        update_data["image_meta"] = None
 
     if image_file and image_file.filename:
-        extension = os.path.splitext(image_file.filename)[1] or ".jpg"
-        file_name = f"blog-{slugify(title)}{extension}"
-        file_path = f"app/static/images/{file_name}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image_file.file, buffer)
-        update_data["image"] = f"/static/images/{file_name}"
+        update_data["image"], update_data["image_meta"] = await ingest_form_image(image_file)
     
-    update_post_sync(id, update_data)
+    await repository.update_post(id, update_data)
     return RedirectResponse("/admin/blog", status_code=302)
 
 @app.get("/admin/blog/delete/{id}", dependencies=[Depends(admin_auth)])
 async def admin_blog_delete(id: str):
-    delete_post_sync(id)
+    await repository.delete_post(id)
     return RedirectResponse("/admin/blog", status_code=302)
 
 # --- Admin Pages ---
 @app.get("/admin/pages", dependencies=[Depends(admin_auth)])
 async def admin_page_list(request: Request):
-    pages = get_pages_sync()
+    pages = await repository.get_pages()
     # Ensure default pages exist
     required = ["home", "about", "privacy", "contact"]
     existing_slugs = [p.get("slug") for p in pages]
     for slug in required:
         if slug not in existing_slugs:
-            create_page_sync({
+            await repository.create_page({
                 "title": slug.capitalize(),
                 "slug": slug,
                 "content": ""
             })
-    pages = get_pages_sync()
+    pages = await repository.get_pages()
     return templates.TemplateResponse("admin/page_list.html", {
         "request": request, 
         "pages": serialize_doc(pages)
@@ -549,7 +685,7 @@ async def admin_page_list(request: Request):
 
 @app.get("/admin/pages/edit/{id}", dependencies=[Depends(admin_auth)])
 async def admin_page_edit(request: Request, id: str):
-    page = get_page_by_id_sync(id)
+    page = await repository.get_page_by_id(id)
     if not page: 
         raise HTTPException(404)
     return templates.TemplateResponse("admin/page_form.html", {
@@ -563,7 +699,7 @@ async def admin_page_update(
     title: str = Form(...),
     content: str = Form(...)
 ):
-    page = get_page_by_id_sync(id)
+    page = await repository.get_page_by_id(id)
     if not page: 
         raise HTTPException(404)
     
@@ -571,5 +707,5 @@ async def admin_page_update(
         "title": title,
         "content": content
     }
-    update_page_sync(id, update_data)
+    await repository.update_page(id, update_data)
     return RedirectResponse("/admin/pages", status_code=302)
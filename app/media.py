@@ -0,0 +1,170 @@
+"""
+Content-addressed media store.
+
+Every image is stored once, keyed by the SHA-256 of its bytes, and served
+from /media/{hash}. Because the URL changes whenever the content changes,
+responses can be cached forever by browsers and CDNs.
+
+Backends:
+    MEDIA_BACKEND=gridfs  (default) stores files in the MongoDB "media" bucket
+    MEDIA_BACKEND=local   stores files under MEDIA_DIR (default: media/)
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists, NoFile
+from pymongo.errors import DuplicateKeyError
+
+from .database_mongo import get_sync_db
+
+MEDIA_PREFIX = "/media/"
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+def sniff_content_type(data: bytes) -> str:
+    """Detect an image MIME type from its magic bytes"""
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def media_url(digest: str) -> str:
+    return f"{MEDIA_PREFIX}{digest}"
+
+def is_valid_hash(digest: str) -> bool:
+    return bool(HASH_PATTERN.match(digest))
+
+class MediaStore(ABC):
+    """Base interface for media backends"""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        """Return (bytes, content_type) or None if the hash is unknown"""
+
+    def put(self, data: bytes) -> str:
+        """Store bytes once and return their hash"""
+        digest = content_hash(data)
+        if not self.exists(digest):
+            self.write(digest, data, sniff_content_type(data))
+        return digest
+
+class GridFSMediaStore(MediaStore):
+    """Stores media in a GridFS bucket with the content hash as file id"""
+
+    def __init__(self, get_db, bucket_name: str = "media"):
+        # The database is resolved on first use so importing this module never connects
+        self._get_db = get_db
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self) -> GridFSBucket:
+        if self._bucket is None:
+            self._bucket = GridFSBucket(self._get_db(), bucket_name=self.bucket_name)
+        return self._bucket
+
+    @property
+    def files(self):
+        return self._get_db()[f"{self.bucket_name}.files"]
+
+    def exists(self, digest: str) -> bool:
+        return self.files.find_one({"_id": digest}, {"_id": 1}) is not None
+
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        try:
+            self.bucket.upload_from_stream_with_id(
+                digest, digest, data, metadata={"contentType": content_type}
+            )
+        except (FileExists, DuplicateKeyError):
+            # Another worker stored the same bytes first
+            pass
+
+    def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        try:
+            stream = self.bucket.open_download_stream(digest)
+        except NoFile:
+            return None
+        metadata = stream.metadata or {}
+        return stream.read(), metadata.get("contentType", "application/octet-stream")
+
+class LocalMediaStore(MediaStore):
+    """Stores media as files under a directory, sharded by hash prefix"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return data, sniff_content_type(data)
+
+def create_media_store() -> MediaStore:
+    backend = os.getenv("MEDIA_BACKEND", "gridfs").lower()
+    if backend == "local":
+        return LocalMediaStore(os.getenv("MEDIA_DIR", "media"))
+    return GridFSMediaStore(get_sync_db)
+
+media_store = create_media_store()
+
+def decode_data_uri(data_uri: str) -> Optional[bytes]:
+    """Return the bytes of a base64 data: URI, or None if it is not one"""
+    if not data_uri or not data_uri.startswith("data:"):
+        return None
+    try:
+        header, encoded = data_uri.split(",", 1)
+        if ";base64" not in header:
+            return None
+        return base64.b64decode(encoded)
+    except (ValueError, binascii.Error):
+        return None
+
+def store_bytes(data: bytes) -> str:
+    """Store image bytes and return their /media URL"""
+    return media_url(media_store.put(data))
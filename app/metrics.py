@@ -0,0 +1,227 @@
+"""
+Prometheus metrics, rendered in the text exposition format.
+
+MetricsMiddleware records, per route template (never per raw URL, to keep
+label cardinality bounded):
+
+    http_requests_total                 counter    route, method, status
+    http_request_duration_seconds       histogram  route, method
+    http_response_size_bytes            histogram  route
+    http_requests_in_flight             gauge
+    http_request_db_commands            histogram  route
+    http_request_db_seconds             histogram  route
+
+db_command_listener is a pymongo CommandListener registered on both Mongo
+clients. It records every command and attributes it to the request that
+issued it through a context variable; Motor runs commands on worker threads
+with a copy of the caller's context, so the per-request tally is shared.
+
+    mongodb_commands_total              counter    command, status
+    mongodb_command_duration_seconds    histogram  command
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+DB_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 32)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter, optionally labelled"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in values]
+
+class Gauge(Counter):
+    """Value that can go up and down; inc() takes negative amounts"""
+
+    kind = "gauge"
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lines = []
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket = _labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra: Optional[Dict[str, dict]] = None) -> str:
+        """Render every metric, plus numeric fields of `extra` stats dicts as gauges"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for prefix, stats in (extra or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE app_{prefix}_{key} gauge")
+                    lines.append(f"app_{prefix}_{key} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", LATENCY_BUCKETS, ("route", "method")))
+http_size = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size", SIZE_BUCKETS, ("route",)))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+request_db_commands = registry.register(Histogram(
+    "http_request_db_commands", "Database commands issued per HTTP request", DB_COUNT_BUCKETS, ("route",)))
+request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in database commands per HTTP request", DB_LATENCY_BUCKETS, ("route",)))
+db_commands = registry.register(Counter(
+    "mongodb_commands_total", "MongoDB commands by name and outcome", ("command", "status")))
+db_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", DB_LATENCY_BUCKETS, ("command",)))
+
+# [commands, seconds] for the request being served, shared with Motor's worker threads
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+class DBCommandListener(monitoring.CommandListener):
+    """Counts and times MongoDB commands, globally and per request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, status: str) -> None:
+        seconds = event.duration_micros / 1_000_000
+        db_commands.inc((event.command_name, status))
+        db_duration.observe(seconds, (event.command_name,))
+        tally = _request_db.get()
+        if tally is not None:
+            tally[0] += 1
+            tally[1] += seconds
+
+db_command_listener = DBCommandListener()
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, size, status and DB usage per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        tally = [0, 0.0]
+        token = _request_db.set(tally)
+        http_in_flight.inc(amount=1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.inc(amount=-1)
+            _request_db.reset(token)
+            route, method = _route_label(scope), scope["method"]
+            http_requests.inc((route, method, str(status)))
+            http_duration.observe(elapsed, (route, method))
+            http_size.observe(size, (route,))
+            request_db_commands.observe(tally[0], (route,))
+            request_db_seconds.observe(tally[1], (route,))
+
+def render(extra: Optional[Dict[str, dict]] = None) -> str:
+    return registry.render(extra)
@@ -0,0 +1,110 @@
+"""
+In-process redirect table for /go/{slug}.
+
+Holds only slug -> udemy_link, plus an id -> slug reverse index so writes
+that identify a course by id can update or drop its entry. Lookups are a
+single dict access, so the redirect route only waits on the database for a
+slug the table doesn't know yet; slugs that turn out not to exist are
+remembered briefly so 404 floods don't reach it either.
+
+The watermark refresh only sees documents that still exist, so a course
+deleted by another process would keep redirecting. An entry that hasn't
+been confirmed for REDIRECT_REFRESH_SECONDS is therefore looked up again on
+its next hit, which costs at most one query per hot slug per interval.
+
+The watermark only moves with set_many(), which the refresh queries use.
+A course written by this process may be newer than documents another
+process wrote and this one hasn't loaded yet, so it must not move it.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from .cache import TTLCache
+
+MISS_TTL = 30.0
+REDIRECT_REFRESH_SECONDS = float(os.getenv("REDIRECT_REFRESH_SECONDS", "60"))
+
+class RedirectTable:
+    """Thread-safe slug -> outbound link map"""
+
+    def __init__(self, max_age: float = REDIRECT_REFRESH_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # slug -> (link, _id, monotonic time it was last read from the database)
+        self._links: Dict[str, Tuple[str, object, float]] = {}
+        self._slugs: Dict[object, str] = {}
+        self._misses = TTLCache(maxsize=4096, ttl=MISS_TTL)
+        self.loaded = False
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def get(self, slug: str) -> Optional[str]:
+        entry = self._links.get(slug)
+        return entry[0] if entry else None
+
+    def needs_lookup(self, slug: str) -> bool:
+        """True if the database should be asked: an unknown slug, or an entry not confirmed recently"""
+        entry = self._links.get(slug)
+        if entry is None:
+            return not self.missed(slug)
+        return time.monotonic() - entry[2] > self.max_age
+
+    def apply_lookup(self, slug: str, doc: Optional[dict]) -> None:
+        """Record what the database returned for a slug; None means it no longer exists"""
+        if doc:
+            self.set(doc)
+            return
+        with self._lock:
+            entry = self._links.get(slug)
+            if entry is not None:
+                self._remove_locked(entry[1])
+        self.add_miss(slug)
+
+    def set(self, doc: dict) -> None:
+        """Add or replace the entry for a document with _id, slug and udemy_link"""
+        with self._lock:
+            self._remove_locked(doc["_id"])
+            slug, link = doc.get("slug"), doc.get("udemy_link")
+            if slug and link:
+                self._links[slug] = (link, doc["_id"], time.monotonic())
+                self._slugs[doc["_id"]] = slug
+                self._misses.invalidate(slug)
+
+    def set_many(self, docs: Iterable[dict]) -> None:
+        """Add documents returned by a refresh query and move the watermark past them"""
+        for doc in docs:
+            self.set(doc)
+            with self._lock:
+                for stamp in (doc.get("created_at"), doc.get("updated_at")):
+                    if stamp and (self.watermark is None or stamp > self.watermark):
+                        self.watermark = stamp
+
+    def missed(self, slug: str) -> bool:
+        """True if the database recently had no course for this slug"""
+        return self._misses.get(slug, False)
+
+    def add_miss(self, slug: str) -> None:
+        self._misses.set(slug, True)
+
+    def remove(self, doc_id) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id) -> None:
+        slug = self._slugs.pop(doc_id, None)
+        if slug is not None:
+            self._links.pop(slug, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._links.clear()
+            self._slugs.clear()
+            self._misses.clear()
+            self.loaded = False
+            self.watermark = None
@@ -0,0 +1,182 @@
+"""
+Storage backend interface for courses, blog posts and pages.
+
+The web tier talks to `repository`, never to a database driver directly.
+Backends are selected with STORAGE_BACKEND:
+
+    mongo   (default) MongoDB via Motor, see repository_mongo.py
+    sqlite  a local SQLite file at SQLITE_PATH, see repository_local.py
+    memory  plain dicts in this process, see repository_local.py
+
+The local backends need no network database, which makes them suitable for
+benchmarks and load tests of the web tier.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+class Repository(ABC):
+    """Base interface for storage backends"""
+
+    async def init(self) -> None:
+        """Prepare the backend (indexes, schema, in-process tables)"""
+
+    async def close(self) -> None:
+        """Release connections"""
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """Stats of the backend's own caches, by name, for /admin/stats and /metrics"""
+        return {}
+
+    # ============ COURSES ============
+
+    @abstractmethod
+    async def create_course(self, course_data: dict) -> dict:
+        """Create or update a course keyed by the slug of its title"""
+
+    @abstractmethod
+    async def upsert_courses(self, courses: List[dict]) -> List[dict]:
+        """Create or update many courses, returning one result per item"""
+
+    @abstractmethod
+    async def get_course(self, slug: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_course_by_id(self, course_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_course(self, course_id: str, update_data: dict) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_course(self, course_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_courses_by_days(self, days: int) -> int:
+        ...
+
+    @abstractmethod
+    async def get_course_image(self, slug: str) -> Optional[str]:
+        ...
+
+    # ============ SEARCH AND REDIRECTS ============
+
+    @abstractmethod
+    async def refresh_search_index(self) -> None:
+        """Load courses written by other processes into the search index"""
+
+    @abstractmethod
+    async def refresh_redirect_table(self) -> None:
+        """Load course links written by other processes into the redirect table"""
+
+    @abstractmethod
+    async def get_redirect_link(self, slug: str) -> Optional[str]:
+        """Outbound link for a course slug, from the redirect table when it has one"""
+
+    # ============ CARDS ============
+
+    @abstractmethod
+    async def get_course_cards(self, limit: Optional[int] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def get_course_cards_page(self, cursor: Optional[str] = None,
+                                    limit: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+        """Return (cards newest first, cursor for the next page or None)"""
+
+    @abstractmethod
+    async def search_course_cards(self, query: str, offset: int = 0,
+                                  limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """Return (one page of matching cards, total number of matches)"""
+
+    @abstractmethod
+    async def get_post_cards(self) -> List[dict]:
+        ...
+
+    # ============ TRENDING ============
+
+    @abstractmethod
+    async def record_course_clicks(self, counts: Dict[str, Tuple[int, float]]) -> int:
+        """Apply {slug: (clicks, log2 of the trend score increment)} in one batch"""
+
+    @abstractmethod
+    async def get_trending_course_cards(self, limit: int) -> List[dict]:
+        ...
+
+    # ============ SITEMAP ============
+
+    @abstractmethod
+    async def get_sitemap_chunk_bounds(self, kind: str, size: int) -> List[Optional[ObjectId]]:
+        """For each chunk of `size` "courses" or "posts" entries, the _id it starts after (None for the first)"""
+
+    @abstractmethod
+    def iter_sitemap_entries(self, kind: str, after: Optional[ObjectId] = None,
+                             limit: int = 0) -> AsyncIterator[dict]:
+        """Slug/date projections of one sitemap chunk: entries after an _id, in _id order"""
+
+    # ============ BLOG POSTS ============
+
+    @abstractmethod
+    async def get_post(self, slug: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_post_by_id(self, post_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_post_image(self, slug: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def create_post(self, post_data: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def update_post(self, post_id: str, update_data: dict) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_post(self, post_id: str) -> bool:
+        ...
+
+    # ============ PAGES ============
+
+    @abstractmethod
+    async def get_pages(self) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def get_page(self, slug: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_page_by_id(self, page_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def create_page(self, page_data: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def update_page(self, page_id: str, update_data: dict) -> bool:
+        ...
+
+def create_repository() -> Repository:
+    backend = os.getenv("STORAGE_BACKEND", "mongo").lower()
+    if backend == "memory":
+        from .repository_local import MemoryStore, DocumentRepository
+        return DocumentRepository(MemoryStore())
+    if backend == "sqlite":
+        from .repository_local import SQLiteStore, DocumentRepository
+        return DocumentRepository(SQLiteStore(os.getenv("SQLITE_PATH", "catalog.sqlite3")))
+    from .repository_mongo import MongoRepository
+    return MongoRepository()
+
+repository = create_repository()
@@ -0,0 +1,566 @@
+"""
+Local storage backends: plain in-process dicts and a SQLite file.
+
+Both keep whole documents in the same shape the MongoDB backend stores
+them, behind a small DocumentStore interface. DocumentRepository implements
+every repository operation in Python on top of those primitives, with its
+own search index and redirect table, so the web tier behaves the same on
+any backend.
+
+Writes made by other processes sharing a SQLite file are picked up by
+refresh_search_index(), which searches run at most every
+SEARCH_REFRESH_SECONDS, and refresh_redirect_table(), like with MongoDB.
+"""
+
+import heapq
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from .crud_mongo import (
+    slugify, bump_catalog_version, encode_cursor, decode_cursor, sitemap_chunk_bounds,
+    COURSE_FIELDS, PAGE_SIZE, MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, SEARCH_REFRESH_SECONDS, EXCERPT_LENGTH
+)
+from .redirects import RedirectTable
+from .repository import Repository
+from .scores import log_add
+from .search import SearchIndex
+
+KINDS = ("courses", "posts", "pages")
+
+Position = Tuple[datetime, ObjectId]
+
+def _now() -> datetime:
+    # MongoDB stores milliseconds; matching it keeps page cursors exact
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def _position(doc: dict) -> Position:
+    return doc.get("created_at") or datetime.min, doc["_id"]
+
+def _changed(doc: dict, watermark: Optional[datetime]) -> bool:
+    if watermark is None:
+        return True
+    return any(stamp and stamp >= watermark for stamp in (doc.get("created_at"), doc.get("updated_at")))
+
+class DocumentStore(ABC):
+    """Base interface for local document stores"""
+
+    # Stores that block on I/O are called from the threadpool
+    blocking = False
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def get(self, kind: str, field: str, value) -> Optional[dict]:
+        """Return the document whose "_id" or "slug" equals value"""
+
+    @abstractmethod
+    def get_many(self, kind: str, ids: List[ObjectId]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def put(self, kind: str, doc: dict) -> None:
+        """Insert or replace a document by _id; slugs must stay unique"""
+
+    @abstractmethod
+    def delete(self, kind: str, doc_id: ObjectId) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_created_since(self, kind: str, cutoff: datetime) -> int:
+        ...
+
+    @abstractmethod
+    def newest(self, kind: str, before: Optional[Position] = None, limit: Optional[int] = None) -> List[dict]:
+        """Documents by created_at then _id, descending, strictly before a position"""
+
+    @abstractmethod
+    def by_id(self, kind: str, after: Optional[ObjectId] = None, limit: int = 0) -> List[dict]:
+        """Documents that have a slug, in _id order, strictly after an _id"""
+
+    @abstractmethod
+    def ids_with_slug(self, kind: str) -> List[ObjectId]:
+        """_ids of the documents that have a slug, sorted"""
+
+    @abstractmethod
+    def trending(self, kind: str, limit: int) -> List[dict]:
+        """Documents that have a trend_log, highest first"""
+
+    @abstractmethod
+    def changed_since(self, kind: str, watermark: Optional[datetime]) -> List[dict]:
+        """Documents created or updated at or after the watermark (all if None)"""
+
+class MemoryStore(DocumentStore):
+    """Documents in dicts, with a slug index and a sorted created_at index"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict[ObjectId, dict]] = {k: {} for k in KINDS}
+        self._slugs: Dict[str, Dict[str, ObjectId]] = {k: {} for k in KINDS}
+        self._order: Dict[str, List[Position]] = {k: [] for k in KINDS}
+
+    def get(self, kind: str, field: str, value) -> Optional[dict]:
+        with self._lock:
+            doc_id = value if field == "_id" else self._slugs[kind].get(value)
+            doc = self._docs[kind].get(doc_id)
+            return dict(doc) if doc else None
+
+    def get_many(self, kind: str, ids: List[ObjectId]) -> List[dict]:
+        with self._lock:
+            docs = self._docs[kind]
+            return [dict(docs[i]) for i in ids if i in docs]
+
+    def put(self, kind: str, doc: dict) -> None:
+        doc = dict(doc)
+        slug = doc.get("slug")
+        with self._lock:
+            if slug and self._slugs[kind].get(slug, doc["_id"]) != doc["_id"]:
+                raise DuplicateKeyError(f"Duplicate slug in {kind}: {slug}")
+            self._remove_locked(kind, doc["_id"])
+            self._docs[kind][doc["_id"]] = doc
+            if slug:
+                self._slugs[kind][slug] = doc["_id"]
+            insort(self._order[kind], _position(doc))
+
+    def delete(self, kind: str, doc_id: ObjectId) -> bool:
+        with self._lock:
+            return self._remove_locked(kind, doc_id)
+
+    def _remove_locked(self, kind: str, doc_id: ObjectId) -> bool:
+        doc = self._docs[kind].pop(doc_id, None)
+        if doc is None:
+            return False
+        if doc.get("slug"):
+            self._slugs[kind].pop(doc["slug"], None)
+        order = self._order[kind]
+        del order[bisect_left(order, _position(doc))]
+        return True
+
+    def delete_created_since(self, kind: str, cutoff: datetime) -> int:
+        with self._lock:
+            ids = [i for i, d in self._docs[kind].items() if d.get("created_at") and d["created_at"] >= cutoff]
+            for doc_id in ids:
+                self._remove_locked(kind, doc_id)
+            return len(ids)
+
+    def newest(self, kind: str, before: Optional[Position] = None, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            order, docs = self._order[kind], self._docs[kind]
+            end = bisect_left(order, before) if before else len(order)
+            start = max(0, end - limit) if limit else 0
+            return [dict(docs[doc_id]) for _, doc_id in reversed(order[start:end])]
+
+    def by_id(self, kind: str, after: Optional[ObjectId] = None, limit: int = 0) -> List[dict]:
+        with self._lock:
+            docs = self._docs[kind]
+            ids = sorted(i for i, d in docs.items() if d.get("slug") and (after is None or i > after))
+            ids = ids[:limit] if limit else ids
+            return [dict(docs[i]) for i in ids]
+
+    def ids_with_slug(self, kind: str) -> List[ObjectId]:
+        with self._lock:
+            return sorted(self._slugs[kind].values())
+
+    def trending(self, kind: str, limit: int) -> List[dict]:
+        with self._lock:
+            scored = [d for d in self._docs[kind].values() if d.get("trend_log") is not None]
+            top = heapq.nlargest(limit, scored, key=lambda d: (d["trend_log"], d["_id"]))
+            return [dict(d) for d in top]
+
+    def changed_since(self, kind: str, watermark: Optional[datetime]) -> List[dict]:
+        with self._lock:
+            return [dict(d) for d in self._docs[kind].values() if _changed(d, watermark)]
+
+def _stamp(value: Optional[datetime]) -> Optional[str]:
+    # Fixed-width ISO strings sort in time order
+    return value.isoformat(sep=" ", timespec="milliseconds") if value else None
+
+class SQLiteStore(DocumentStore):
+    """
+    Documents as Extended JSON in one table per kind. The fields the store
+    filters or sorts on are copied into indexed columns.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for kind in KINDS:
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS {kind} (
+                id TEXT PRIMARY KEY,
+                slug TEXT UNIQUE,
+                created_at TEXT,
+                updated_at TEXT,
+                trend_log REAL,
+                doc TEXT NOT NULL
+            )""")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {kind}_newest ON {kind} (created_at DESC, id DESC)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {kind}_updated ON {kind} (updated_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {kind}_trending ON {kind} (trend_log DESC, id DESC)")
+        self._conn = conn
+
+    def close(self) -> None:
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _query(self, sql: str, params: tuple = ()) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json_util.loads(row[0]) for row in rows]
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def get(self, kind: str, field: str, value) -> Optional[dict]:
+        column = "id" if field == "_id" else "slug"
+        docs = self._query(f"SELECT doc FROM {kind} WHERE {column} = ?", (str(value),))
+        return docs[0] if docs else None
+
+    def get_many(self, kind: str, ids: List[ObjectId]) -> List[dict]:
+        if not ids:
+            return []
+        marks = ", ".join("?" * len(ids))
+        return self._query(f"SELECT doc FROM {kind} WHERE id IN ({marks})", tuple(str(i) for i in ids))
+
+    def put(self, kind: str, doc: dict) -> None:
+        try:
+            self._execute(
+                f"""INSERT INTO {kind} (id, slug, created_at, updated_at, trend_log, doc)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET slug = excluded.slug, created_at = excluded.created_at,
+                        updated_at = excluded.updated_at, trend_log = excluded.trend_log, doc = excluded.doc""",
+                (str(doc["_id"]), doc.get("slug") or None, _stamp(doc.get("created_at")),
+                 _stamp(doc.get("updated_at")), doc.get("trend_log"), json_util.dumps(doc))
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"Duplicate slug in {kind}: {doc.get('slug')}") from e
+
+    def delete(self, kind: str, doc_id: ObjectId) -> bool:
+        return self._execute(f"DELETE FROM {kind} WHERE id = ?", (str(doc_id),)) > 0
+
+    def delete_created_since(self, kind: str, cutoff: datetime) -> int:
+        return self._execute(f"DELETE FROM {kind} WHERE created_at >= ?", (_stamp(cutoff),))
+
+    def newest(self, kind: str, before: Optional[Position] = None, limit: Optional[int] = None) -> List[dict]:
+        sql, params = f"SELECT doc FROM {kind}", ()
+        if before:
+            created_at, doc_id = _stamp(before[0]), str(before[1])
+            sql += " WHERE created_at < ? OR (created_at = ? AND id < ?)"
+            params = (created_at, created_at, doc_id)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        return self._query(sql, params + (limit or -1,))
+
+    def by_id(self, kind: str, after: Optional[ObjectId] = None, limit: int = 0) -> List[dict]:
+        # Hex ObjectIds sort as text the same way they sort as ids
+        return self._query(f"SELECT doc FROM {kind} WHERE slug IS NOT NULL AND id > ? ORDER BY id LIMIT ?",
+                           (str(after) if after else "", limit or -1))
+
+    def ids_with_slug(self, kind: str) -> List[ObjectId]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id FROM {kind} WHERE slug IS NOT NULL ORDER BY id").fetchall()
+        return [ObjectId(row[0]) for row in rows]
+
+    def trending(self, kind: str, limit: int) -> List[dict]:
+        return self._query(f"SELECT doc FROM {kind} WHERE trend_log IS NOT NULL ORDER BY trend_log DESC, id DESC LIMIT ?",
+                           (limit,))
+
+    def changed_since(self, kind: str, watermark: Optional[datetime]) -> List[dict]:
+        if watermark is None:
+            return self._query(f"SELECT doc FROM {kind}")
+        stamp = _stamp(watermark)
+        return self._query(f"SELECT doc FROM {kind} WHERE created_at >= ? OR updated_at >= ?", (stamp, stamp))
+
+def _card(doc: dict, excerpt_field: str, image_prefix: str) -> dict:
+    """The list-view projection the MongoDB card queries build on the server"""
+    card = {k: doc[k] for k in ("_id", "title", "slug", "created_at", "updated_at", "image_meta") if k in doc}
+    excerpt = doc.get(excerpt_field) or ""
+    card["excerpt"] = excerpt[:EXCERPT_LENGTH].rstrip() + "…" if len(excerpt) > EXCERPT_LENGTH else excerpt
+    image = doc.get("image")
+    if image and image.startswith("data:"):
+        image = f"{image_prefix}{doc.get('slug')}"
+    if image is not None:
+        card["image"] = image
+    return card
+
+def _course_card(doc: dict) -> dict:
+    return _card(doc, "description", "/image/course/")
+
+def _post_card(doc: dict) -> dict:
+    return _card(doc, "excerpt", "/image/post/")
+
+class DocumentRepository(Repository):
+    """Repository implemented in Python over a DocumentStore"""
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+        self.search_index = SearchIndex()
+        self.redirects = RedirectTable()
+        self._search_synced_at: Optional[float] = None
+        # Serializes read-modify-write sequences from threadpool workers
+        self._write_lock = threading.Lock()
+
+    async def _call(self, method, *args):
+        if self.store.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def init(self) -> None:
+        await self._call(self.store.open)
+        await self.refresh_search_index()
+        await self.refresh_redirect_table()
+
+    async def close(self) -> None:
+        await self._call(self.store.close)
+
+    def _update(self, kind: str, doc_id: str, update_data: dict) -> Optional[dict]:
+        update_data["updated_at"] = _now()
+        with self._write_lock:
+            doc = self.store.get(kind, "_id", ObjectId(doc_id))
+            if doc is None:
+                return None
+            doc.update(update_data)
+            self.store.put(kind, doc)
+        return doc
+
+    def _insert(self, kind: str, doc: dict) -> dict:
+        doc["_id"] = ObjectId()
+        self.store.put(kind, doc)
+        return doc
+
+    # ============ COURSES ============
+
+    def _course_written(self, doc: dict) -> None:
+        self.search_index.add(doc)
+        self.redirects.set(doc)
+
+    def _upsert_course(self, course_data: dict, now: datetime) -> Tuple[dict, bool]:
+        # Same semantics as the MongoDB upsert: None fields never overwrite
+        slug = slugify(course_data.get("title", ""))
+        values = {k: course_data.get(k) for k in COURSE_FIELDS}
+        with self._write_lock:
+            existing = self.store.get("courses", "slug", slug)
+            if existing:
+                doc = {**existing, **{k: v for k, v in values.items() if v is not None}, "updated_at": now}
+            else:
+                doc = {"_id": ObjectId(), **values, "slug": slug, "created_at": now, "updated_at": now}
+            self.store.put("courses", doc)
+        self._course_written(doc)
+        return doc, existing is None
+
+    def _upsert_courses(self, courses: List[dict]) -> List[dict]:
+        now = _now()
+        results = []
+        for i, course_data in enumerate(courses):
+            slug = slugify(course_data.get("title", ""))
+            try:
+                doc, created = self._upsert_course(course_data, now)
+            except DuplicateKeyError as e:
+                results.append({"index": i, "slug": slug, "status": "error", "error": str(e)})
+                continue
+            if created:
+                results.append({"index": i, "slug": slug, "status": "created", "id": str(doc["_id"])})
+            else:
+                results.append({"index": i, "slug": slug, "status": "updated"})
+        return results
+
+    async def create_course(self, course_data: dict) -> dict:
+        doc, _ = await self._call(self._upsert_course, course_data, _now())
+        bump_catalog_version()
+        return doc
+
+    async def upsert_courses(self, courses: List[dict]) -> List[dict]:
+        if not courses:
+            return []
+        results = await self._call(self._upsert_courses, courses)
+        bump_catalog_version()
+        return results
+
+    async def get_course(self, slug: str) -> Optional[dict]:
+        return await self._call(self.store.get, "courses", "slug", slug)
+
+    async def get_course_by_id(self, course_id: str) -> Optional[dict]:
+        return await self._call(self.store.get, "courses", "_id", ObjectId(course_id))
+
+    async def update_course(self, course_id: str, update_data: dict) -> bool:
+        doc = await self._call(self._update, "courses", course_id, update_data)
+        if doc:
+            self._course_written(doc)
+        bump_catalog_version()
+        return doc is not None
+
+    async def delete_course(self, course_id: str) -> bool:
+        deleted = await self._call(self.store.delete, "courses", ObjectId(course_id))
+        self.search_index.remove(ObjectId(course_id))
+        self.redirects.remove(ObjectId(course_id))
+        bump_catalog_version()
+        return deleted
+
+    async def delete_courses_by_days(self, days: int) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        deleted = await self._call(self.store.delete_created_since, "courses", cutoff)
+        self.search_index.remove_where_created_since(cutoff)
+        self.redirects.clear()
+        await self.refresh_redirect_table()
+        bump_catalog_version()
+        return deleted
+
+    async def get_course_image(self, slug: str) -> Optional[str]:
+        doc = await self.get_course(slug)
+        return doc.get("image") if doc else None
+
+    # ============ SEARCH AND REDIRECTS ============
+
+    async def refresh_search_index(self) -> None:
+        docs = await self._call(self.store.changed_since, "courses", self.search_index.watermark)
+        self.search_index.add_many(docs)
+        self._search_synced_at = time.monotonic()
+
+    async def refresh_redirect_table(self) -> None:
+        self.redirects.set_many(await self._call(self.store.changed_since, "courses", self.redirects.watermark))
+        self.redirects.loaded = True
+
+    async def get_redirect_link(self, slug: str) -> Optional[str]:
+        if self.redirects.needs_lookup(slug):
+            self.redirects.apply_lookup(slug, await self.get_course(slug))
+        return self.redirects.get(slug)
+
+    # ============ CARDS ============
+
+    async def get_course_cards(self, limit: Optional[int] = None) -> List[dict]:
+        docs = await self._call(self.store.newest, "courses", None, limit)
+        return [_course_card(d) for d in docs]
+
+    async def get_course_cards_page(self, cursor: Optional[str] = None,
+                                    limit: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+        limit = max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+        docs = await self._call(self.store.newest, "courses", decode_cursor(cursor), limit + 1)
+        cards = [_course_card(d) for d in docs[:limit]]
+        return cards, encode_cursor(cards[-1]) if len(docs) > limit else None
+
+    async def search_course_cards(self, query: str, offset: int = 0,
+                                  limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        if self._search_synced_at is None or time.monotonic() - self._search_synced_at > SEARCH_REFRESH_SECONDS:
+            await self.refresh_search_index()
+        ids, total = self.search_index.search(query, offset, limit or SEARCH_PAGE_SIZE)
+        by_id = {d["_id"]: d for d in await self._call(self.store.get_many, "courses", ids)}
+        return [_course_card(by_id[i]) for i in ids if i in by_id], total
+
+    async def get_post_cards(self) -> List[dict]:
+        return [_post_card(d) for d in await self._call(self.store.newest, "posts")]
+
+    # ============ TRENDING ============
+
+    def _record_clicks(self, counts: Dict[str, Tuple[int, float]]) -> int:
+        modified = 0
+        with self._write_lock:
+            for slug, (clicks, score) in counts.items():
+                doc = self.store.get("courses", "slug", slug)
+                if doc:
+                    doc["clicks"] = (doc.get("clicks") or 0) + clicks
+                    doc["trend_log"] = log_add(doc.get("trend_log"), score)
+                    self.store.put("courses", doc)
+                    modified += 1
+        return modified
+
+    async def record_course_clicks(self, counts: Dict[str, Tuple[int, float]]) -> int:
+        if not counts:
+            return 0
+        return await self._call(self._record_clicks, counts)
+
+    async def get_trending_course_cards(self, limit: int) -> List[dict]:
+        return [_course_card(d) for d in await self._call(self.store.trending, "courses", limit)]
+
+    # ============ SITEMAP ============
+
+    async def get_sitemap_chunk_bounds(self, kind: str, size: int) -> List[Optional[ObjectId]]:
+        return sitemap_chunk_bounds(await self._call(self.store.ids_with_slug, kind), size)
+
+    async def iter_sitemap_entries(self, kind: str, after: Optional[ObjectId] = None,
+                                   limit: int = 0) -> AsyncIterator[dict]:
+        for doc in await self._call(self.store.by_id, kind, after, limit):
+            yield {k: doc.get(k) for k in ("_id", "slug", "created_at", "updated_at")}
+
+    # ============ BLOG POSTS ============
+
+    async def get_post(self, slug: str) -> Optional[dict]:
+        return await self._call(self.store.get, "posts", "slug", slug)
+
+    async def get_post_by_id(self, post_id: str) -> Optional[dict]:
+        return await self._call(self.store.get, "posts", "_id", ObjectId(post_id))
+
+    async def get_post_image(self, slug: str) -> Optional[str]:
+        doc = await self.get_post(slug)
+        return doc.get("image") if doc else None
+
+    async def create_post(self, post_data: dict) -> dict:
+        post_doc = {
+            "title": post_data.get("title"),
+            "slug": slugify(post_data.get("title", "")),
+            "content": post_data.get("content"),
+            "excerpt": post_data.get("excerpt"),
+            "image": post_data.get("image"),
+            "image_meta": post_data.get("image_meta"),
+            "is_published": post_data.get("is_published", True),
+            "created_at": _now()
+        }
+        post_doc = await self._call(self._insert, "posts", post_doc)
+        bump_catalog_version()
+        return post_doc
+
+    async def update_post(self, post_id: str, update_data: dict) -> bool:
+        doc = await self._call(self._update, "posts", post_id, update_data)
+        bump_catalog_version()
+        return doc is not None
+
+    async def delete_post(self, post_id: str) -> bool:
+        deleted = await self._call(self.store.delete, "posts", ObjectId(post_id))
+        bump_catalog_version()
+        return deleted
+
+    # ============ PAGES ============
+
+    async def get_pages(self) -> List[dict]:
+        return await self._call(self.store.changed_since, "pages", None)
+
+    async def get_page(self, slug: str) -> Optional[dict]:
+        return await self._call(self.store.get, "pages", "slug", slug)
+
+    async def get_page_by_id(self, page_id: str) -> Optional[dict]:
+        return await self._call(self.store.get, "pages", "_id", ObjectId(page_id))
+
+    async def create_page(self, page_data: dict) -> dict:
+        page_doc = {
+            "slug": page_data.get("slug"),
+            "title": page_data.get("title"),
+            "content": page_data.get("content", ""),
+            "updated_at": _now()
+        }
+        page_doc = await self._call(self._insert, "pages", page_doc)
+        bump_catalog_version()
+        return page_doc
+
+    async def update_page(self, page_id: str, update_data: dict) -> bool:
+        doc = await self._call(self._update, "pages", page_id, update_data)
+        bump_catalog_version()
+        return doc is not None
@@ -0,0 +1,135 @@
+"""
+MongoDB storage backend.
+
+A thin adapter over the async functions in crud_mongo, which own the
+queries, the course cache, the search index and the redirect table.
+"""
+
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from . import crud_mongo as crud
+from .database_mongo import init_db, close_db
+from .repository import Repository
+
+class MongoRepository(Repository):
+    """Repository backed by MongoDB through Motor"""
+
+    async def init(self) -> None:
+        await init_db()
+        await crud.refresh_search_index_async()
+        await crud.refresh_redirect_table_async()
+
+    def cache_stats(self) -> Dict[str, dict]:
+        return {"course_cache": crud.get_course_cache_stats()}
+
+    async def close(self) -> None:
+        await close_db()
+
+    # ============ COURSES ============
+
+    async def create_course(self, course_data: dict) -> dict:
+        return await crud.create_course_async(course_data)
+
+    async def upsert_courses(self, courses: List[dict]) -> List[dict]:
+        return await crud.upsert_courses_async(courses)
+
+    async def get_course(self, slug: str) -> Optional[dict]:
+        return await crud.get_course_async(slug)
+
+    async def get_course_by_id(self, course_id: str) -> Optional[dict]:
+        return await crud.get_course_by_id_async(course_id)
+
+    async def update_course(self, course_id: str, update_data: dict) -> bool:
+        return await crud.update_course_async(course_id, update_data)
+
+    async def delete_course(self, course_id: str) -> bool:
+        return await crud.delete_course_async(course_id)
+
+    async def delete_courses_by_days(self, days: int) -> int:
+        return await crud.delete_courses_by_days_async(days)
+
+    async def get_course_image(self, slug: str) -> Optional[str]:
+        return await crud.get_course_image_async(slug)
+
+    # ============ SEARCH AND REDIRECTS ============
+
+    async def refresh_search_index(self) -> None:
+        await crud.refresh_search_index_async()
+
+    async def refresh_redirect_table(self) -> None:
+        await crud.refresh_redirect_table_async()
+
+    async def get_redirect_link(self, slug: str) -> Optional[str]:
+        return await crud.get_redirect_link_async(slug)
+
+    # ============ CARDS ============
+
+    async def get_course_cards(self, limit: Optional[int] = None) -> List[dict]:
+        return await crud.get_course_cards_async(limit)
+
+    async def get_course_cards_page(self, cursor: Optional[str] = None,
+                                    limit: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+        return await crud.get_course_cards_page_async(cursor, limit or crud.PAGE_SIZE)
+
+    async def search_course_cards(self, query: str, offset: int = 0,
+                                  limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        return await crud.search_course_cards_async(query, offset, limit or crud.SEARCH_PAGE_SIZE)
+
+    async def get_post_cards(self) -> List[dict]:
+        return await crud.get_post_cards_async()
+
+    # ============ TRENDING ============
+
+    async def record_course_clicks(self, counts: Dict[str, Tuple[int, float]]) -> int:
+        return await crud.record_course_clicks_async(counts)
+
+    async def get_trending_course_cards(self, limit: int) -> List[dict]:
+        return await crud.get_trending_course_cards_async(limit)
+
+    # ============ SITEMAP ============
+
+    async def get_sitemap_chunk_bounds(self, kind: str, size: int) -> List[Optional[ObjectId]]:
+        return await crud.get_sitemap_chunk_bounds_async(kind, size)
+
+    def iter_sitemap_entries(self, kind: str, after: Optional[ObjectId] = None,
+                             limit: int = 0) -> AsyncIterator[dict]:
+        return crud.iter_sitemap_entries_async(kind, after, limit)
+
+    # ============ BLOG POSTS ============
+
+    async def get_post(self, slug: str) -> Optional[dict]:
+        return await crud.get_post_async(slug)
+
+    async def get_post_by_id(self, post_id: str) -> Optional[dict]:
+        return await crud.get_post_by_id_async(post_id)
+
+    async def get_post_image(self, slug: str) -> Optional[str]:
+        return await crud.get_post_image_async(slug)
+
+    async def create_post(self, post_data: dict) -> dict:
+        return await crud.create_post_async(post_data)
+
+    async def update_post(self, post_id: str, update_data: dict) -> bool:
+        return await crud.update_post_async(post_id, update_data)
+
+    async def delete_post(self, post_id: str) -> bool:
+        return await crud.delete_post_async(post_id)
+
+    # ============ PAGES ============
+
+    async def get_pages(self) -> List[dict]:
+        return await crud.get_pages_async()
+
+    async def get_page(self, slug: str) -> Optional[dict]:
+        return await crud.get_page_async(slug)
+
+    async def get_page_by_id(self, page_id: str) -> Optional[dict]:
+        return await crud.get_page_by_id_async(page_id)
+
+    async def create_page(self, page_data: dict) -> dict:
+        return await crud.create_page_async(page_data)
+
+    async def update_page(self, page_id: str, update_data: dict) -> bool:
+        return await crud.update_page_async(page_id, update_data)
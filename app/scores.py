@@ -0,0 +1,17 @@
+"""
+Log-space arithmetic for trending scores.
+
+Forward-decayed click weights grow without bound, so scores are kept as
+log2 of their sum (trend_log) and combined with log_add. Shared by the
+trending tracker and the storage backends.
+"""
+
+import math
+from typing import Optional
+
+def log_add(a: Optional[float], b: float) -> float:
+    """log2(2 ** a + 2 ** b), computed around the larger term so it never overflows"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
@@ -0,0 +1,152 @@
+"""
+In-process full-text search index for courses.
+
+An inverted index over course titles and descriptions, kept current by the
+write functions in crud_mongo. Queries are tokenized the same way as the
+documents; every query term must match, either exactly or as a prefix of an
+indexed term, and results are ranked by a TF-IDF score with title matches
+weighted above description matches. Ties go to the newest course.
+
+The watermark for catch-up queries only moves with add_many(), which the
+refresh paths use; a local add() must not skip documents other processes
+wrote with slightly older timestamps.
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_PENALTY = 0.5
+MAX_PREFIX_EXPANSION = 50
+MIN_PREFIX_LENGTH = 2
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+class SearchIndex:
+    """Thread-safe inverted index keyed by document id"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[object, float]] = {}
+        self._doc_terms: Dict[object, Dict[str, float]] = {}
+        self._created: Dict[object, datetime] = {}
+        self._sorted_terms: List[str] = []
+        self._terms_dirty = False
+        self.loaded = False
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._created.clear()
+            self._sorted_terms = []
+            self._terms_dirty = False
+            self.loaded = False
+            self.watermark = None
+
+    def add(self, doc: dict) -> None:
+        """Index (or re-index) a document with _id, title, description and created_at"""
+        terms: Dict[str, float] = {}
+        for token in tokenize(doc.get("title")):
+            terms[token] = terms.get(token, 0.0) + TITLE_WEIGHT
+        for token in tokenize(doc.get("description")):
+            terms[token] = terms.get(token, 0.0) + DESCRIPTION_WEIGHT
+
+        doc_id = doc["_id"]
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, weight in terms.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = {}
+                    self._terms_dirty = True
+                posting[doc_id] = weight
+            self._doc_terms[doc_id] = terms
+            self._created[doc_id] = doc.get("created_at") or datetime.min
+
+    def add_many(self, docs: Iterable[dict]) -> None:
+        """Index documents returned by a refresh query and move the watermark past them"""
+        for doc in docs:
+            self.add(doc)
+            with self._lock:
+                for stamp in (doc.get("created_at"), doc.get("updated_at")):
+                    if stamp and (self.watermark is None or stamp > self.watermark):
+                        self.watermark = stamp
+
+    def remove(self, doc_id) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def remove_where_created_since(self, cutoff: datetime) -> None:
+        with self._lock:
+            for doc_id in [d for d, created in self._created.items() if created >= cutoff]:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id) -> None:
+        for term in self._doc_terms.pop(doc_id, {}):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+                    self._terms_dirty = True
+        self._created.pop(doc_id, None)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Return the indexed terms a query token matches, with their weight factor"""
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+        if len(token) >= MIN_PREFIX_LENGTH:
+            if self._terms_dirty:
+                self._sorted_terms = sorted(self._postings)
+                self._terms_dirty = False
+            i = bisect_left(self._sorted_terms, token)
+            while i < len(self._sorted_terms) and len(matches) < MAX_PREFIX_EXPANSION:
+                term = self._sorted_terms[i]
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    matches.append((term, PREFIX_PENALTY))
+                i += 1
+        return matches
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[object], int]:
+        """Return (document ids for the requested slice, total number of matches)"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            total_docs = len(self._doc_terms) or 1
+            scores: Optional[Dict[object, float]] = None
+            for token in tokens:
+                token_scores: Dict[object, float] = {}
+                for term, factor in self._expand(token):
+                    posting = self._postings[term]
+                    idf = math.log(1 + total_docs / len(posting))
+                    for doc_id, weight in posting.items():
+                        score = factor * weight * idf
+                        if score > token_scores.get(doc_id, 0.0):
+                            token_scores[doc_id] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+                if not scores:
+                    return [], 0
+
+            ranked = sorted(scores, key=lambda d: (scores[d], self._created.get(d, datetime.min)), reverse=True)
+        return ranked[offset:offset + limit], len(ranked)
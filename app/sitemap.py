@@ -0,0 +1,132 @@
+"""
+Sitemap generation.
+
+/sitemap.xml is a sitemap index pointing at gzip-compressed child sitemaps
+of at most SITEMAP_MAX_URLS URLs each:
+
+    /sitemaps/static-1.xml.gz     fixed site pages
+    /sitemaps/posts-N.xml.gz      blog posts
+    /sitemaps/courses-N.xml.gz    courses
+
+Child sitemaps are streamed from projected cursors and compressed as they
+are produced. Each chunk is read as a range on _id, starting after the last
+_id of the chunk before it; those bounds come from one pass over the _ids
+and are cached with the index. The finished bytes are cached under the
+catalog version, so crawlers get precomputed output until the next write.
+"""
+
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from xml.sax.saxutils import escape
+
+from bson import ObjectId
+
+from .cache import TTLCache
+from .crud_mongo import catalog_version
+from .repository import repository
+
+SITEMAP_MAX_URLS = 50000
+# Compress in blocks rather than per URL to keep zlib overhead low
+GZIP_BLOCK_SIZE = 64 * 1024
+
+STATIC_PATHS = ["", "/about", "/contact", "/privacy", "/blog", "/courses"]
+
+SECTIONS = {
+    "courses": {"prefix": "/course/", "changefreq": "daily", "priority": "1.0"},
+    "posts": {"prefix": "/blog/", "changefreq": "weekly", "priority": "0.7"},
+}
+
+# The TTL bounds staleness for writes made by other processes
+sitemap_cache = TTLCache(maxsize=64, ttl=3600)
+
+def _lastmod(doc: dict) -> str:
+    stamp: Optional[datetime] = doc.get("updated_at") or doc.get("created_at")
+    return stamp.strftime('%Y-%m-%d') if stamp else ""
+
+def _url(loc: str, changefreq: str, priority: str, lastmod: str = "") -> str:
+    lastmod_tag = f"\n        <lastmod>{lastmod}</lastmod>" if lastmod else ""
+    return f"""
+    <url>
+        <loc>{escape(loc)}</loc>{lastmod_tag}
+        <changefreq>{changefreq}</changefreq>
+        <priority>{priority}</priority>
+    </url>"""
+
+async def _chunk_bounds(kind: str) -> List[Optional[ObjectId]]:
+    """The _id each child sitemap of a section starts after, cached until the next catalog write"""
+    key = ("bounds", kind, catalog_version())
+    bounds = sitemap_cache.get(key)
+    if bounds is None:
+        bounds = await repository.get_sitemap_chunk_bounds(kind, SITEMAP_MAX_URLS)
+        sitemap_cache.set(key, bounds)
+    return bounds
+
+async def build_index(base_url: str) -> bytes:
+    """Render the sitemap index, cached until the next catalog write"""
+    key = ("index", base_url, catalog_version())
+    cached = sitemap_cache.get(key)
+    if cached is not None:
+        return cached
+
+    names = ["static-1"]
+    for kind in ("posts", "courses"):
+        bounds = await _chunk_bounds(kind)
+        names.extend(f"{kind}-{n}" for n in range(1, len(bounds) + 1))
+
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for name in names:
+        parts.append(f"\n    <sitemap>\n        <loc>{escape(base_url)}/sitemaps/{name}.xml.gz</loc>\n    </sitemap>")
+    parts.append("\n</sitemapindex>")
+    body = "".join(parts).encode("utf-8")
+    sitemap_cache.set(key, body)
+    return body
+
+async def _child_xml(base_url: str, kind: str, number: int) -> AsyncIterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    if kind == "static":
+        for path in STATIC_PATHS:
+            yield _url(f"{base_url}{path}", "daily", "0.8")
+    else:
+        section, bounds = SECTIONS[kind], await _chunk_bounds(kind)
+        # Past the last chunk there is nothing to list
+        if number <= len(bounds):
+            cursor = repository.iter_sitemap_entries(kind, bounds[number - 1], SITEMAP_MAX_URLS)
+            async for doc in cursor:
+                yield _url(f"{base_url}{section['prefix']}{doc['slug']}",
+                           section["changefreq"], section["priority"], _lastmod(doc))
+    yield "\n</urlset>"
+
+def is_valid_child(kind: str, number: int) -> bool:
+    return (kind == "static" and number == 1) or (kind in SECTIONS and number >= 1)
+
+def cached_child(base_url: str, kind: str, number: int) -> Optional[bytes]:
+    """Return a finished gzip child sitemap if one is cached for this catalog version"""
+    return sitemap_cache.get((kind, number, base_url, catalog_version()))
+
+async def stream_child(base_url: str, kind: str, number: int) -> AsyncIterator[bytes]:
+    """Stream a gzip child sitemap, caching the complete output once it finishes"""
+    key = (kind, number, base_url, catalog_version())
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    produced = []
+
+    def compress(pieces: List[str]) -> bytes:
+        data = compressor.compress("".join(pieces).encode("utf-8"))
+        produced.append(data)
+        return data
+
+    pending, pending_size = [], 0
+    async for piece in _child_xml(base_url, kind, number):
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= GZIP_BLOCK_SIZE:
+            data = compress(pending)
+            pending, pending_size = [], 0
+            if data:
+                yield data
+
+    data = compress(pending)
+    tail = compressor.flush()
+    produced.append(tail)
+    yield data + tail
+    sitemap_cache.set(key, b"".join(produced))
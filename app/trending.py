@@ -0,0 +1,109 @@
+"""
+Trending courses, fed by outbound clicks on /go/{slug}.
+
+Clicks are counted in memory and flushed every TRENDING_FLUSH_SECONDS as a
+single bulk write. Scores decay with a half-life using forward decay: each
+click adds 2 ** ((t - EPOCH) / half_life) instead of 1, so older clicks
+weigh relatively less without ever rewriting stored scores.
+
+Those weights double every half-life and would leave float range after
+about 1000 of them, so scores are kept in log space: trend_log is log2 of
+the summed weights, and adding a click is a log-add. It orders courses
+exactly like the decayed score and stays small forever.
+
+After each flush the top TRENDING_SIZE course cards are reloaded, so the
+home page reads a precomputed list instead of scanning the catalog.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .repository import repository
+from .scores import log_add
+
+# Fixed landmark for forward decay; click weights double every half-life after it
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+class TrendingTracker:
+    """Buffers clicks and keeps a precomputed list of trending course cards"""
+
+    def __init__(self, flush_interval: float = 30.0, size: int = 8, half_life_hours: float = 72.0):
+        self.flush_interval = flush_interval
+        self.size = size
+        self.half_life = half_life_hours * 3600
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[int, Optional[float]]] = {}
+        self._top: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_clicks = 0
+
+    def log_weight(self, now: Optional[float] = None) -> float:
+        """log2 of the score a click made at `now` adds under forward decay"""
+        return ((now or time.time()) - EPOCH) / self.half_life
+
+    def record(self, slug: str) -> None:
+        """Count one click; O(1) and never touches the database"""
+        weight = self.log_weight()
+        with self._lock:
+            clicks, score = self._pending.get(slug, (0, None))
+            self._pending[slug] = (clicks + 1, log_add(score, weight))
+
+    def top(self, limit: Optional[int] = None) -> List[dict]:
+        return self._top[:limit or self.size]
+
+    async def refresh(self) -> None:
+        """Reload the precomputed top-N course cards"""
+        self._top = await repository.get_trending_course_cards(self.size)
+
+    async def flush(self) -> None:
+        """Write buffered clicks in one bulk update, then refresh the top-N"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                await repository.record_course_clicks(pending)
+            except Exception:
+                # Put the counts back so the next flush retries them
+                with self._lock:
+                    for slug, (clicks, score) in pending.items():
+                        old_clicks, old_score = self._pending.get(slug, (0, None))
+                        self._pending[slug] = (old_clicks + clicks, log_add(old_score, score))
+                raise
+            self.flushes += 1
+            self.flushed_clicks += sum(clicks for clicks, _ in pending.values())
+        await self.refresh()
+
+    async def _safe_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"⚠️ Trending flush failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self._safe_flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(clicks for clicks, _ in self._pending.values())
+        return {
+            "pending_clicks": pending,
+            "flushes": self.flushes,
+            "flushed_clicks": self.flushed_clicks,
+            "top": [c.get("slug") for c in self._top]
+        }
@@ -0,0 +1,232 @@
+"""
+Benchmark suite for the web app
+Drives the FastAPI app in-process through an ASGI client against a local
+datastore seeded with a synthetic catalog, and reports p50/p99 latency,
+throughput and response size for the public hot paths. Each catalog size
+runs in a fresh subprocess so caches and indexes never leak between runs.
+
+Results are saved as JSON (one file per run, named after the current git
+commit by default) so runs can be compared across commits.
+
+Usage:
+    python benchmark.py                                # 1k, 10k, 100k courses, memory backend
+    python benchmark.py --sizes 1000 --requests 500
+    python benchmark.py --backend sqlite --concurrency 8
+    python benchmark.py --page-cache                   # measure with the rendered-page cache on
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SEED_BATCH = 1000
+
+TOPICS = ["python", "java", "javascript", "react", "docker", "kubernetes", "excel", "photoshop",
+          "marketing", "finance", "sql", "django", "flutter", "aws", "linux", "unity", "rust", "golang"]
+LEVELS = ["beginner", "complete", "advanced", "practical", "ultimate", "hands-on", "essential"]
+KINDS = ["bootcamp", "masterclass", "course", "guide", "crash course", "workshop"]
+WORDS = ["learn", "build", "projects", "real", "world", "from", "scratch", "master", "skills",
+         "apps", "data", "design", "career", "modern", "tools", "best", "practices", "step", "by"]
+SEARCH_QUERIES = ["python", "java boot", "react projects", "docker kubernetes", "sql", "mast"]
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def sample_image() -> str:
+    """A base64 JPEG data: URI like the ones the Telegram bot used to store inline"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return "data:image/jpeg;base64," + base64.b64encode(os.urandom(30000)).decode("ascii")
+    img = Image.linear_gradient("L").resize((640, 360)).convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=90)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def synthetic_courses(count: int, image_ratio: float, seed: int = 42):
+    """Yield deterministic course payloads; a share of them carry inline images"""
+    rng = random.Random(seed)
+    image = sample_image()
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        title = f"{rng.choice(LEVELS).title()} {topic.title()} {rng.choice(KINDS).title()} {i}"
+        description = " ".join(rng.choice(WORDS + [topic]) for _ in range(rng.randint(40, 120)))
+        yield {
+            "title": title,
+            "description": description.capitalize(),
+            "rating": f"{rng.uniform(3.5, 5.0):.1f}",
+            "instructor": f"Instructor {rng.randint(1, 500)}",
+            "udemy_link": f"https://www.udemy.com/course/{topic}-{i}/?couponCode=FREE{i}",
+            "image": image if rng.random() < image_ratio else f"https://img-c.udemycdn.com/course/480x270/{i}.jpg"
+        }
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+async def measure(client, make_path, requests: int, concurrency: int, warmup: int) -> dict:
+    """Time `requests` GETs of make_path(i), `concurrency` at a time"""
+    latencies, sizes, errors = [], [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        started = time.perf_counter()
+        response = await client.get(make_path(i))
+        latencies.append(time.perf_counter() - started)
+        sizes.append(len(response.content))
+        if response.status_code >= 400:
+            errors += 1
+
+    await one(0)
+    cold = latencies.pop()
+    sizes.pop()
+    for i in range(warmup):
+        await one(i)
+    latencies.clear()
+    sizes.clear()
+
+    started = time.perf_counter()
+    for batch in range(0, requests, concurrency):
+        await asyncio.gather(*(one(i) for i in range(batch, min(batch + concurrency, requests))))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "cold_ms": round(cold * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_bytes": round(sum(sizes) / len(sizes))
+    }
+
+async def run_size(size: int, args) -> dict:
+    """Seed one catalog and benchmark every endpoint against it"""
+    import httpx
+    from app.main import app, page_cache
+    from app.repository import repository
+
+    page_cache.enabled = args.page_cache
+    for handler in app.router.on_startup:
+        await handler()
+
+    started = time.perf_counter()
+    slugs, batch = [], []
+    for course in synthetic_courses(size, args.image_ratio):
+        batch.append(course)
+        if len(batch) == SEED_BATCH:
+            slugs.extend(r["slug"] for r in await repository.upsert_courses(batch))
+            batch = []
+    if batch:
+        slugs.extend(r["slug"] for r in await repository.upsert_courses(batch))
+    seed_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    picks = [rng.choice(slugs) for _ in range(args.requests + args.warmup + 1)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Second page of /courses, to time a keyset cursor lookup
+        next_page = re.search(r'/courses\?cursor=([^"&]+)', (await client.get("/courses")).text)
+        deep = f"/courses?cursor={next_page.group(1)}" if next_page else "/courses"
+        endpoints = {
+            "/": lambda i: "/",
+            "/courses": lambda i: "/courses",
+            "/courses?cursor": lambda i: deep,
+            "/course/{slug}": lambda i: f"/course/{picks[i]}",
+            "/go/{slug}": lambda i: f"/go/{picks[i]}",
+            "/search": lambda i: f"/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}",
+            "/sitemap.xml": lambda i: "/sitemap.xml",
+            "/sitemaps/courses-1.xml.gz": lambda i: "/sitemaps/courses-1.xml.gz"
+        }
+        results = {}
+        for name, make_path in endpoints.items():
+            results[name] = await measure(client, make_path, args.requests, args.concurrency, args.warmup)
+            print(f"   {name:<28} p50 {results[name]['p50_ms']:>9.2f} ms  p99 {results[name]['p99_ms']:>9.2f} ms  "
+                  f"{results[name]['throughput_rps']:>9.1f} req/s  {results[name]['mean_bytes']:>9} B", flush=True)
+
+    for handler in app.router.on_shutdown:
+        await handler()
+    return {"courses": size, "seed_seconds": round(seed_seconds, 2), "endpoints": results}
+
+def run_single(args):
+    """Child process entry point: benchmark one catalog size and write its JSON"""
+    result = asyncio.run(run_size(args.single, args))
+    with open(args.output, "w") as f:
+        json.dump(result, f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the web app in-process")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalog sizes to seed")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "mongo"], default="memory")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="share of courses with inline base64 images")
+    parser.add_argument("--page-cache", action="store_true", help="leave the rendered-page cache enabled")
+    parser.add_argument("--output", help="results file (default: benchmark-<commit>.json)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args)
+        return
+
+    commit = git_commit()
+    output = args.output or f"benchmark-{commit}.json"
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, STORAGE_BACKEND=args.backend, MEDIA_BACKEND="local",
+                   MEDIA_DIR=os.path.join(tmp, "media"))
+        for size in args.sizes:
+            print("=" * 60)
+            print(f"📊 {size:,} courses ({args.backend})")
+            print("=" * 60)
+            size_env = dict(env, SQLITE_PATH=os.path.join(tmp, f"bench-{size}.sqlite3"))
+            if args.backend == "mongo":
+                size_env["DATABASE_NAME"] = f"benchmark_{size}"
+            result_path = os.path.join(tmp, f"result-{size}.json")
+            cmd = [sys.executable, os.path.abspath(__file__), "--single", str(size), "--output", result_path,
+                   "--requests", str(args.requests), "--warmup", str(args.warmup),
+                   "--concurrency", str(args.concurrency), "--image-ratio", str(args.image_ratio)]
+            if args.page_cache:
+                cmd.append("--page-cache")
+            subprocess.run(cmd, cwd=ROOT, env=size_env, check=True)
+            with open(result_path) as f:
+                runs.append(json.load(f))
+
+    report = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "page_cache": args.page_cache,
+        "image_ratio": args.image_ratio,
+        "runs": runs
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Build step for /static
+1. Writes a maximum-compression .gz copy (and a .br copy when the brotli
+   package is installed) next to every compressible static file, so the web
+   app serves them without compressing per request. Copies are only rebuilt
+   when the source file is newer, and are skipped when they would not be
+   smaller than the original.
+2. Hashes every static file into app/asset-manifest.json, which maps
+   "style.css" to the fingerprinted "style.<hash>.css" the templates link to.
+
+Usage:
+    python build_static.py
+"""
+
+import json
+import mimetypes
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.assets import build_manifest
+from app.compression import SUFFIXES, is_compressible, precompress
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "static")
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "asset-manifest.json")
+
+def static_files():
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in sorted(files):
+            if os.path.splitext(name)[1] in SUFFIXES.values():
+                continue
+            yield os.path.join(root, name)
+
+def compress_static() -> int:
+    written = 0
+    for path in static_files():
+        if not is_compressible(mimetypes.guess_type(path)[0] or ""):
+            continue
+        for target in precompress(path):
+            original, compressed = os.path.getsize(path), os.path.getsize(target)
+            print(f"   {os.path.relpath(target, STATIC_DIR)}: {original:,} -> {compressed:,} bytes")
+            written += 1
+    return written
+
+def write_manifest() -> int:
+    manifest = build_manifest(STATIC_DIR)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return len(manifest)
+
+if __name__ == "__main__":
+    print("📦 Precompressing static files...")
+    print(f"✅ {compress_static()} compressed copies written")
+    print("🔖 Fingerprinting static files...")
+    print(f"✅ {write_manifest()} assets written to {os.path.relpath(MANIFEST_PATH)}")
@@ -0,0 +1,85 @@
+"""
+Migration script to move images into the content-addressed media store
+Pulls inline base64 images and local /static/images files out of course
+and blog post documents, stores each distinct image once along with its
+card variants, and rewrites the document to point at /media/{hash}.
+
+Usage:
+    python migrate_media.py            # migrate
+    python migrate_media.py --dry-run  # report only
+"""
+
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database_mongo import sync_courses_collection, sync_blog_posts_collection
+from app.media import MEDIA_PREFIX, media_store, decode_data_uri, content_hash
+from app.images import ingest_image_bytes
+
+STATIC_IMAGE_PREFIX = "/static/images/"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "static", "images")
+
+def load_image(image: str):
+    """Return the bytes behind an image reference, or None if it cannot be moved"""
+    data = decode_data_uri(image)
+    if data is not None:
+        return data
+    if image.startswith(MEDIA_PREFIX):
+        found = media_store.get(image[len(MEDIA_PREFIX):])
+        return found[0] if found else None
+    if image.startswith(STATIC_IMAGE_PREFIX):
+        path = os.path.join(STATIC_DIR, os.path.basename(image))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+    return None
+
+def migrate_collection(collection, name: str, dry_run: bool = False):
+    """Move images out of one collection"""
+    query = {"$or": [
+        {"image": {"$regex": f"^(data:|{STATIC_IMAGE_PREFIX})"}},
+        # Already in the media store but stored before card variants existed
+        {"image": {"$regex": f"^{MEDIA_PREFIX}"}, "image_meta": None}
+    ]}
+    total = collection.count_documents(query)
+    print(f"📦 Found {total} {name} with images to migrate...")
+
+    migrated = 0
+    saved_bytes = 0
+    seen = set()
+    # Only _id and image are read; the rest of the document never leaves Atlas
+    for doc in collection.find(query, {"image": 1}):
+        data = load_image(doc["image"])
+        if data is None:
+            print(f"⚠️  Skipping {doc['_id']}: image file not found")
+            continue
+
+        seen.add(content_hash(data))
+        saved_bytes += len(doc["image"])
+        migrated += 1
+        if dry_run:
+            continue
+
+        url, image_meta = ingest_image_bytes(data)
+        # A new updated_at makes the web workers' refresh and fragment caches pick up the new URL
+        collection.update_one({"_id": doc["_id"]}, {"$set": {
+            "image": url, "image_meta": image_meta, "updated_at": datetime.utcnow()
+        }})
+        print(f"✅ {doc['_id']} -> {url}")
+
+    print(f"✨ Migrated {migrated} {name} ({len(seen)} distinct images, {saved_bytes:,} bytes removed from documents)")
+    return migrated
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv
+    print("=" * 60)
+    print("🖼️  Migrating images to the media store" + (" (dry run)" if dry_run else ""))
+    print("=" * 60)
+    migrate_collection(sync_courses_collection, "courses", dry_run)
+    migrate_collection(sync_blog_posts_collection, "blog posts", dry_run)
@@ -0,0 +1,130 @@
+"""
+Cross-channel duplicate suppression.
+
+Several SOURCE_CHANNELS often post the same coupon within minutes. Each
+message is fingerprinted from its text alone (no network), before any
+parsing or resolution work:
+
+    title    normalized course title + coupon code, when the text names a coupon
+    course   Udemy course slug + coupon code, when the text has a Udemy link with a coupon
+
+A message is a duplicate if any of its fingerprints was seen within the
+window. A title or course alone is not a fingerprint: the same course
+re-announced with a new coupon must get through, so posts without a visible
+coupon (e.g. Coursevania links) are only deduplicated by link_fingerprints()
+once their link has been resolved to one with a coupon.
+
+Fingerprints live in an in-memory LRU, so a check is a few dict lookups.
+Every new fingerprint is also written behind to SQLite on the file's writer
+thread (see local_db.py), so the window survives restarts without a disk
+write on the event loop.
+
+Settings (env):
+    DEDUP_PATH           SQLite file (default: dedup.sqlite3 next to the bot)
+    DEDUP_WINDOW_HOURS   how long a fingerprint suppresses repeats (default: 48)
+    DEDUP_MAX_ENTRIES    fingerprints kept in memory (default: 50000)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from local_db import LocalDB, db_path
+from parser import extract_coupon_code
+
+_UDEMY_COURSE = re.compile(r"udemy\.com/course/([A-Za-z0-9_-]+)", re.IGNORECASE)
+_COUPON_PARAM = re.compile(r"couponCode=([A-Za-z0-9_-]+)", re.IGNORECASE)
+
+def normalize_title(title: str) -> str:
+    """Lowercase words of a title, without markdown or [tags] and (notes)"""
+    title = re.sub(r"\[[^\]]*\]|\([^)]*\)", " ", title.replace("*", "").lower())
+    return " ".join(re.findall(r"[a-z0-9]+", title))
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=12).hexdigest()
+
+def link_fingerprints(udemy_link: Optional[str]) -> List[str]:
+    """Fingerprint of a Udemy course link and its coupon; none for a link without a coupon"""
+    match = _UDEMY_COURSE.search(udemy_link or "")
+    coupon = _COUPON_PARAM.search(udemy_link or "")
+    if not match or not coupon:
+        return []
+    return [_digest("course", match.group(1).lower(), coupon.group(1).upper())]
+
+def message_fingerprints(text: str) -> List[str]:
+    """Fingerprints of a channel post, computed from its text only"""
+    lines = [l.strip() for l in (text or "").split("\n") if l.strip()]
+    if not lines:
+        return []
+    param = _COUPON_PARAM.search(text)
+    coupon = (param.group(1) if param else extract_coupon_code(text) or "").upper()
+    keys = link_fingerprints(text)
+    title = normalize_title(lines[0])
+    if title and coupon:
+        keys.append(_digest("title", title, coupon))
+    return keys
+
+class RecentFingerprints:
+    """Time-windowed LRU of fingerprints with SQLite write-through"""
+
+    def __init__(self, path: str, window_seconds: float, max_entries: int = 50000):
+        self.window = window_seconds
+        self.max_entries = max_entries
+        self.duplicates = 0
+        self._writes = 0
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = LocalDB(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS fingerprints (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        cutoff = time.time() - self.window
+        self._db.execute("DELETE FROM fingerprints WHERE seen_at <= ?", (cutoff,))
+        rows = self._db.query(
+            "SELECT key, seen_at FROM fingerprints ORDER BY seen_at DESC LIMIT ?", (max_entries,)
+        )
+        for key, seen_at in reversed(rows):
+            self._seen[key] = seen_at
+
+    def check_and_add(self, keys: Iterable[str]) -> bool:
+        """True if any key was seen within the window; otherwise remember all of them"""
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                seen_at = self._seen.get(key)
+                if seen_at is not None and now - seen_at < self.window:
+                    self.duplicates += 1
+                    return True
+            for key in keys:
+                self._seen[key] = now
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+        if keys:
+            self._db.submit(self._persist, keys, now)
+        return False
+
+    def _persist(self, keys: List[str], now: float) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO fingerprints (key, seen_at) VALUES (?, ?)", [(k, now) for k in keys]
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._db.execute("DELETE FROM fingerprints WHERE seen_at <= ?", (now - self.window,))
+
+    def forget(self, keys: Iterable[str]) -> None:
+        """Drop keys of a post that was not published, so another channel's copy can be"""
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._seen.pop(key, None)
+        self._db.submit(self._db.executemany, "DELETE FROM fingerprints WHERE key = ?", [(k,) for k in keys])
+
+recent_posts = RecentFingerprints(
+    db_path("DEDUP_PATH", "dedup.sqlite3"),
+    window_seconds=float(os.getenv("DEDUP_WINDOW_HOURS", "48")) * 3600,
+    max_entries=int(os.getenv("DEDUP_MAX_ENTRIES", "50000"))
+)
@@ -0,0 +1,84 @@
+"""
+Shared async HTTP clients for the bot.
+
+Three keep-alive pools are created lazily on the running event loop:
+  - web:     httpx, for og:image and other plain page fetches
+  - browser: curl_cffi impersonating Chrome, for Coursevania's WAF
+  - api:     httpx, for posting courses to the website (see outbox.py)
+
+Each pool has its own concurrency limit, so a burst of slow Coursevania
+pages can never starve the rest of the bot. The bot's event loop is
+recreated when web_bot.py restarts it, so clients are rebuilt whenever the
+loop changes and closed by close_clients() on shutdown.
+"""
+
+import asyncio
+import os
+
+import httpx
+from curl_cffi.requests import AsyncSession
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+WEB_CONCURRENCY = int(os.getenv("HTTP_WEB_CONCURRENCY", "8"))
+BROWSER_CONCURRENCY = int(os.getenv("HTTP_BROWSER_CONCURRENCY", "3"))
+API_CONNECTIONS = int(os.getenv("HTTP_API_CONNECTIONS", "2"))
+
+_loop = None
+_web = None
+_browser = None
+_api = None
+_web_slots = None
+_browser_slots = None
+
+def _ensure_clients():
+    global _loop, _web, _browser, _api, _web_slots, _browser_slots
+    loop = asyncio.get_running_loop()
+    if _loop is loop:
+        return
+    _loop = loop
+    _web = httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=WEB_CONCURRENCY, max_keepalive_connections=WEB_CONCURRENCY)
+    )
+    _browser = AsyncSession(impersonate="chrome", max_clients=BROWSER_CONCURRENCY)
+    _api = httpx.AsyncClient(
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=API_CONNECTIONS, max_keepalive_connections=API_CONNECTIONS)
+    )
+    _web_slots = asyncio.Semaphore(WEB_CONCURRENCY)
+    _browser_slots = asyncio.Semaphore(BROWSER_CONCURRENCY)
+
+async def fetch_page(url: str, timeout: float = 10):
+    """GET a page with the shared httpx pool, returning (status_code, text)"""
+    _ensure_clients()
+    async with _web_slots:
+        r = await _web.get(url, timeout=timeout)
+        return r.status_code, r.text
+
+async def fetch_page_as_browser(url: str, timeout: float = 15):
+    """GET a page through curl_cffi's Chrome impersonation, returning (status_code, text)"""
+    _ensure_clients()
+    async with _browser_slots:
+        r = await _browser.get(url, timeout=timeout, allow_redirects=True)
+        return r.status_code, r.text
+
+async def post_json(url: str, payload, timeout: float = 30):
+    """POST JSON with the website API pool, returning (status_code, parsed body or None)"""
+    _ensure_clients()
+    r = await _api.post(url, json=payload, timeout=timeout)
+    try:
+        return r.status_code, r.json()
+    except ValueError:
+        return r.status_code, None
+
+async def close_clients():
+    global _loop, _web, _browser, _api
+    if _web is not None:
+        await _web.aclose()
+    if _browser is not None:
+        await _browser.close()
+    if _api is not None:
+        await _api.aclose()
+    _loop = _web = _browser = _api = None
@@ -0,0 +1,29 @@
+import io
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAX_WIDTH = 1280
+
+def shrink_image(data: bytes, max_width: int = MAX_WIDTH) -> bytes:
+    """
+    Caps a photo's width before it is base64-encoded and sent to the website.
+    The website builds its own card variants; this only keeps the original small.
+    Returns the input unchanged if Pillow is missing or the photo is already small.
+    """
+    if Image is None:
+        return data
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.width <= max_width:
+            return data
+        height = round(img.height * max_width / img.width)
+        img = img.convert("RGB").resize((max_width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+        return out.getvalue()
+    except Exception as e:
+        print(f"⚠️ Image shrink failed, sending original: {e}")
+        return data
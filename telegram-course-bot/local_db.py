@@ -0,0 +1,80 @@
+"""
+SQLite files kept next to the bot: the outbox, the dedup window and the
+link resolution cache.
+
+Each one is opened through LocalDB: a single connection shared across
+threads, in WAL mode so reads don't wait for writes, guarded by a lock.
+Writes go through one background thread per file, so the event loop never
+waits on the disk and a file's writes still happen in the order they were
+issued. run() waits for the result without blocking the loop; submit()
+doesn't wait at all, for write-behind updates that nothing reads back.
+
+Each file's location is set by its own env setting (OUTBOX_PATH,
+DEDUP_PATH, RESOLUTION_CACHE_PATH) and defaults to the bot's directory.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+BOT_DIR = Path(__file__).resolve().parent
+
+def db_path(setting: str, filename: str) -> str:
+    """The SQLite file named by an env setting, or `filename` next to the bot"""
+    return os.getenv(setting) or str(BOT_DIR / filename)
+
+def _report_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ SQLite write failed: {future.exception()}")
+
+class LocalDB:
+    """A shared SQLite connection with a lock and a single writer thread"""
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{Path(path).stem}")
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        with self.lock:
+            return self.conn.executemany(sql, rows)
+
+    def query(self, sql: str, params=()) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql: str, params=()) -> Optional[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the lock for several statements that must apply together"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    async def run(self, func, *args):
+        """Call func(*args) on the writer thread and wait for its result"""
+        return await asyncio.wrap_future(self._writer.submit(func, *args))
+
+    def submit(self, func, *args) -> None:
+        """Call func(*args) on the writer thread without waiting; failures are logged"""
+        self._writer.submit(func, *args).add_done_callback(_report_failure)
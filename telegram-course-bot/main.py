@@ -1,80 +1,175 @@
+import asyncio
+import base64
+import os
+from io import BytesIO
 from telethon import TelegramClient, events
 from config import *
-from parser import parse_course
+from parser import parse_course, fetch_og_image
 from poster import post_to_channel
-from website import save_course
+from website import course_payload
 from utils import slugify
+from images import shrink_image
+from http_clients import close_clients
+from dedup import recent_posts, message_fingerprints, link_fingerprints
+from pipeline import Pipeline
+from outbox import outbox
 
 
 # Global client removed to avoid event loop conflicts in threads
 # client = TelegramClient("user_session_clean", api_id, api_hash)
 # Handlers are now registered inside main()
 
+# Ingestion runs as a staged pipeline (see pipeline.py); the handler only
+# fingerprints the message and queues it. Worker counts per stage:
+PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "8"))
+IMAGE_WORKERS = int(os.getenv("PIPELINE_IMAGE_WORKERS", "4"))
+PUBLISH_WORKERS = int(os.getenv("PIPELINE_PUBLISH_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+DRAIN_SECONDS = float(os.getenv("PIPELINE_DRAIN_SECONDS", "60"))
+
+pipeline = None
+
 async def course_handler(event):
     """
     Event handler for new messages. 
     Registered dynamically in main() to ensure robust loop handling.
     """
-    # Access client from the event itself to avoid global scope issues
-    client = event.client
-    
+    # 🔁 DROP CROSS-CHANNEL DUPLICATES before any network work
+    keys = message_fingerprints(event.message.text)
+    if recent_posts.check_and_add(keys):
+        print(f"🔁 Duplicate skipped from {event.chat_id}")
+        return
+
+    # Waits while the pipeline is full, which holds back further updates
+    await pipeline.submit({"event": event, "keys": keys})
+
+async def download_photo(event):
+    """Telegram photo bytes, or None if the download fails"""
     try:
-        text = event.message.text
-        # print(f"\n📩 New message received from {event.chat_id}")
+        print("🖼️ Downloading image from Telegram...")
+        image_bytes = BytesIO()
+        await event.client.download_media(event.message.photo, file=image_bytes)
+        return image_bytes.getvalue()
+    except Exception as e:
+        print(f"⚠️ Photo download failed, falling back to OG image: {e}")
+        return None
 
-        course = parse_course(event.message)
-        
-        if not course:
-            # print("⚠️ Message ignored (parser returned None)")
-            return
+async def parse_stage(job):
+    """
+    Parse the message and resolve its links. The photo download doesn't
+    depend on the link, so it runs alongside resolution; when there is a
+    photo the og:image lookup is skipped, since it would be discarded.
+    """
+    event, keys = job["event"], job["keys"]
+    # print(f"\n📩 New message received from {event.chat_id}")
+
+    has_photo = bool(event.message.photo)
+    download = asyncio.create_task(download_photo(event)) if has_photo else None
+    try:
+        course = await parse_course(event.message, fetch_image=not has_photo)
+    except BaseException:
+        if download:
+            download.cancel()
+        raise
+    
+    if not course:
+        # print("⚠️ Message ignored (parser returned None)")
+        if download:
+            download.cancel()
+        recent_posts.forget(keys)
+        return None
+
+    print(f"📝 Parsed course: {course['title']} | Status: {course.get('status')}")
 
-        print(f"📝 Parsed course: {course['title']} | Status: {course.get('status')}")
+    if not course.get("udemy_link"):
+        print("⚠️ Course ignored or needs manual review (No Link)")
+        if download:
+            download.cancel()
+        recent_posts.forget(keys)
+        return None
 
-        if not course.get("udemy_link"):
-            print("⚠️ Course ignored or needs manual review (No Link)")
-            return
+    # A Coursevania post and a direct Udemy post of the same coupon only match once resolved
+    link_keys = [k for k in link_fingerprints(course["udemy_link"]) if k not in keys]
+    if recent_posts.check_and_add(link_keys):
+        print(f"🔁 Duplicate skipped after resolving: {course['udemy_link']}")
+        if download:
+            download.cancel()
+        return None
+    keys += link_keys
 
-        # 🔗 SHOW THE EXTRACTED UDEMY LINK
-        print(f"🔗 Udemy Link: {course.get('udemy_link')}")
+    # 🔗 SHOW THE EXTRACTED UDEMY LINK
+    print(f"🔗 Udemy Link: {course.get('udemy_link')}")
+    
+    # ✅ CREATE SLUG FIRST (CRITICAL)
+    course["slug"] = slugify(course["title"])
+    job["course"] = course
+    job["photo"] = await download if download else None
+    return job
+
+async def image_stage(job):
+    """Encode the downloaded photo, or fall back to the og:image"""
+    course, photo = job["course"], job.pop("photo")
+
+    # 🖼️ HANDLE IMAGE (Base64 for MongoDB Storage)
+    if photo:
+        # Cap the original's size (CPU-bound, so off the event loop); the website builds card variants itself
+        photo = await asyncio.to_thread(shrink_image, photo)
         
-        # ✅ CREATE SLUG FIRST (CRITICAL)
-        course["slug"] = slugify(course["title"])
-
-        # 🖼️ HANDLE IMAGE (Base64 for MongoDB Storage)
-        # Check if message has a photo to upload
-        if event.message.photo:
-            print("🖼️ Downloading image from Telegram...")
-            
-            # Download image to memory (BytesIO)
-            from io import BytesIO
-            import base64
-            
-            image_bytes = BytesIO()
-            await client.download_media(event.message.photo, file=image_bytes)
-            image_bytes.seek(0)
-            
-            # Convert to Base64
-            image_base64 = base64.b64encode(image_bytes.read()).decode('utf-8')
-            
-            # Create data URI for HTML img tag
-            course["image"] = f"data:image/jpeg;base64,{image_base64}"
-            print(f"✅ Image converted to Base64 (size: {len(image_base64)} chars)")
-            
-        else:
-             # Fallback to OG if no photo
-             course["image"] = course.get("image_url")
-
-        print("SENDING TO WEBSITE:", course)
-
-        save_course(course, WEBSITE_API)
+        # Convert to Base64
+        image_base64 = base64.b64encode(photo).decode('utf-8')
         
-        # Pass the actual media object to the poster to send to Telegram
-        await post_to_channel(client, TARGET_CHANNEL, course, WEBSITE_BASE, media=event.message.media)
+        # Create data URI for HTML img tag
+        course["image"] = f"data:image/jpeg;base64,{image_base64}"
+        print(f"✅ Image converted to Base64 (size: {len(image_base64)} chars)")
+        
+    else:
+         # Fallback to OG if no photo (or its download failed, so the lookup was skipped)
+         if not course.get("image_url") and job["event"].message.photo:
+             course["image_url"] = await fetch_og_image(course["udemy_link"])
+         course["image"] = course.get("image_url")
+    return job
 
-        print("✅ Course posted successfully (Stateless)")
+async def publish_stage(job):
+    """Queue the course for the website, with the repost the outbox sends once it is delivered"""
+    event, course = job["event"], job["course"]
 
-    except Exception as e:
-        print("❌ ERROR in handler:", e)
+    print(f"SENDING TO WEBSITE: {course['title']} ({course['slug']})")
+
+    # Durable outbox (see outbox.py): the course is delivered even if the website is down right now,
+    # and the repost survives a restart, so it refers to the source message rather than holding it
+    await outbox.append(course_payload(course), repost={
+        "chat_id": event.chat_id,
+        "message_id": event.message.id,
+        "course": {k: course.get(k) for k in ("title", "description", "slug")},
+        "keys": job["keys"]
+    })
+    # The outbox row holds the base64 image now; don't keep a second copy with the job
+    course.pop("image", None)
+    return None
+
+async def repost(client, record, delivered):
+    """Repost to the target channel once the course page exists, so it never links to a 404"""
+    if not delivered:
+        print("❌ Website rejected the course, not reposting")
+        recent_posts.forget(record["keys"])
+        return
+
+    # Pass the source message's media object to the poster to send to Telegram
+    message = await client.get_messages(record["chat_id"], ids=record["message_id"])
+    media = message.media if message else None
+    await post_to_channel(client, TARGET_CHANNEL, record["course"], WEBSITE_BASE, media=media)
+
+    print("✅ Course posted successfully (Stateless)")
+
+def stage_failed(stage, job, error):
+    print(f"❌ ERROR in {stage} stage:", error)
+    recent_posts.forget(job["keys"])
+
+def build_pipeline():
+    return (Pipeline(on_error=stage_failed)
+            .add_stage("parse", parse_stage, PARSE_WORKERS, QUEUE_SIZE)
+            .add_stage("image", image_stage, IMAGE_WORKERS, QUEUE_SIZE)
+            .add_stage("publish", publish_stage, PUBLISH_WORKERS, QUEUE_SIZE))
 
 async def main():
     """
@@ -84,8 +179,15 @@ async def main():
     
     # Initialize client HERE, inside the async function (uses current loop)
     # Using 'with' block acts as start() and disconnect() automatically
-    async with TelegramClient("user_session_clean", api_id, api_hash) as client:
+    # sequential_updates: the handler only queues work, and a full pipeline
+    # should hold back update processing instead of spawning a task per update
+    global pipeline
+    async with TelegramClient("user_session_clean", api_id, api_hash, sequential_updates=True) as client:
         
+        pipeline = build_pipeline()
+        pipeline.start()
+        outbox.start(WEBSITE_API, on_repost=lambda record, delivered: repost(client, record, delivered))
+
         # Register event handler dynamically
         client.add_event_handler(course_handler, events.NewMessage(chats=SOURCE_CHANNELS))
         
@@ -93,14 +195,21 @@ async def main():
         print("------------------------------------------------")
         
         # Keep running
-        await client.run_until_disconnected()
+        try:
+            await client.run_until_disconnected()
+        finally:
+            # Finish queued courses while the client can still post them
+            client.remove_event_handler(course_handler)
+            await pipeline.drain(DRAIN_SECONDS)
+            # Deliver and repost what is due; the rest waits in the outbox for the next start
+            await outbox.close(DRAIN_SECONDS)
+            await close_clients()
 
 def start_bot():
     """
     Entry point for external scripts (like web_bot.py).
     Creates a new loop and runs the main async function.
     """
-    import asyncio
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -28,7 +28,7 @@ async def handler(event):
     try:
         text = event.message.text
 
-        course = parse_course(event.message)
+        course = await parse_course(event.message)
         
         if not course:
             return
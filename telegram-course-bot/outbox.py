@@ -0,0 +1,325 @@
+"""
+Durable outbox for courses on their way to the website.
+
+publish_stage appends each course to a SQLite table, and a background sender
+posts the due rows in batches to the website's bulk endpoint (WEBSITE_API +
+"/bulk") over the pooled API client. A row is deleted only once the website
+reports it created or updated, so delivery is at least once: whatever is
+still queued when the bot stops is sent after it restarts. The website
+upserts by slug, so delivering a course twice just updates it.
+
+A course can carry a repost, whatever the bot needs to announce it in the
+target channel. It is stored in the course's row and moves to the reposts
+table in the same transaction that settles the row: marked delivered once
+the website confirms the course, undelivered if the row goes dead. A second
+task hands reposts to the handler given to start(), one at a time, and
+deletes each once handled. A repost therefore never links to a course page
+that doesn't exist yet, however long the website takes to come up, and one
+still waiting when the bot stops is sent after it restarts.
+
+All SQLite work runs on the file's writer thread (see local_db.py), since
+each append waits for an fsync.
+
+Failures back off exponentially, with jitter:
+  - the request as a whole fails (website unreachable, a 5xx, or any other
+    non-200 status, e.g. a 404 before the bulk endpoint is deployed): the
+    sender pauses, up to OUTBOX_BACKOFF_MAX between tries, and keeps
+    retrying without counting it against any course
+  - the bulk response reports an error for a course, or the website refuses
+    a request of that course alone (400, 413, 422): only that row is
+    delayed; after OUTBOX_MAX_ATTEMPTS such errors it is marked dead and
+    kept for inspection. A refused batch is split until the course at
+    fault is on its own.
+
+Settings (env):
+    OUTBOX_PATH           SQLite file (default: outbox.sqlite3 next to the bot)
+    OUTBOX_BATCH_SIZE     courses per request (default: 20, at most 1000)
+    OUTBOX_BATCH_BYTES    payload bytes per request, roughly (default: 4000000)
+    OUTBOX_BACKOFF_BASE   first retry delay in seconds (default: 2)
+    OUTBOX_BACKOFF_MAX    longest retry delay in seconds (default: 300)
+    OUTBOX_MAX_ATTEMPTS   per-course errors before it is marked dead (default: 8)
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from http_clients import post_json
+from local_db import LocalDB, db_path
+
+# The website's MAX_BULK_COURSES
+MAX_BATCH_SIZE = 1000
+# After a wakeup, wait this long so courses published together share a request
+LINGER_SECONDS = 0.2
+# Whole-request statuses that resending the same courses can't fix
+REFUSED_STATUSES = (400, 413, 422)
+# Reposts read per query; they are still handled one at a time
+REPOST_BATCH = 20
+
+# Called with a repost and whether its course reached the website
+RepostHandler = Callable[[dict, bool], Awaitable[None]]
+
+def bulk_url(api_url: str) -> str:
+    return api_url.rstrip("/") + "/bulk"
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Delay before retry number `attempt` (1-based): doubling, capped, jittered"""
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+class Outbox:
+    """SQLite-backed queue of course payloads with a batching sender and a reposter"""
+
+    def __init__(self, path: str, batch_size: int = 20, batch_bytes: int = 4000000,
+                 backoff_base: float = 2, backoff_max: float = 300, max_attempts: int = 8):
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.batch_bytes = batch_bytes
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.url = None
+        self.on_repost: Optional[RepostHandler] = None
+        self.sent = 0
+        self.rejected = 0
+        self._failures = 0
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._reposts_ready: Optional[asyncio.Event] = None
+        # An appended course must survive a crash or power loss, not just a clean exit
+        self._db = LocalDB(path, synchronous="FULL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                repost TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                dead INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (dead, next_attempt_at)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS reposts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                repost TEXT NOT NULL,
+                delivered INTEGER NOT NULL
+            )
+        """)
+
+    async def append(self, payload: dict, repost: Optional[dict] = None) -> None:
+        """Queue a course, and the repost to hand over once it is settled; returns once it is on disk"""
+        await self._db.run(self._insert, json.dumps(payload), None if repost is None else json.dumps(repost))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _insert(self, payload: str, repost: Optional[str]) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO outbox (payload, repost, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+            (payload, repost, now, now)
+        )
+
+    def start(self, api_url: str, on_repost: Optional[RepostHandler] = None) -> None:
+        """Start the sender, and the reposter if there is a handler, on the running loop; leftovers go first"""
+        self.url = bulk_url(api_url)
+        self.on_repost = on_repost
+        self._failures = 0
+        self._wakeup = asyncio.Event()
+        self._reposts_ready = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(), name="outbox")]
+        if on_repost is not None:
+            self._tasks.append(asyncio.create_task(self._run_reposts(), name="outbox-reposts"))
+        stats = self.stats()
+        if stats["pending"] or stats["reposts"]:
+            print(f"📮 Outbox resuming with {stats['pending']} queued courses and {stats['reposts']} reposts")
+
+    async def close(self, timeout: float = 30) -> None:
+        """Give the sender and reposter up to `timeout` seconds to finish what is due, then stop them"""
+        if not self._tasks:
+            return
+        deadline = time.monotonic() + timeout
+        while (time.monotonic() < deadline and not any(task.done() for task in self._tasks)
+               and await self._db.run(self._unfinished)):
+            await asyncio.sleep(0.2)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = self._reposts_ready = None
+        stats = self.stats()
+        if stats["pending"] or stats["reposts"]:
+            print(f"📮 Outbox stopped with {stats['pending']} courses and {stats['reposts']} reposts "
+                  f"queued for the next start")
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            batch = await self._db.run(self._due_batch)
+            if not batch:
+                await self._idle()
+                continue
+            pause = await self._send(batch)
+            if pause:
+                await asyncio.sleep(pause)
+
+    async def _idle(self) -> None:
+        """Sleep until a course is appended or a delayed row becomes due"""
+        (next_at,) = await self._db.run(
+            self._db.query_one, "SELECT MIN(next_attempt_at) FROM outbox WHERE dead = 0"
+        )
+        timeout = None if next_at is None else max(0.0, next_at - time.time())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return
+        await asyncio.sleep(LINGER_SECONDS)
+
+    def _due_batch(self) -> List[Tuple[int, str]]:
+        rows = self._db.query(
+            "SELECT id, payload FROM outbox WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (time.time(), self.batch_size)
+        )
+        batch, size = [], 0
+        for row_id, payload in rows:
+            if batch and size + len(payload) > self.batch_bytes:
+                break
+            batch.append((row_id, payload))
+            size += len(payload)
+        return batch
+
+    def _unfinished(self) -> int:
+        """Due rows, plus waiting reposts when there is a reposter to send them"""
+        (due,) = self._db.query_one(
+            "SELECT COUNT(*) FROM outbox WHERE dead = 0 AND next_attempt_at <= ?", (time.time(),)
+        )
+        if self.on_repost is None:
+            return due
+        (reposts,) = self._db.query_one("SELECT COUNT(*) FROM reposts")
+        return due + reposts
+
+    async def _send(self, batch: List[Tuple[int, str]]) -> Optional[float]:
+        """Post one batch; returns how long to pause if the website is unavailable"""
+        try:
+            status, body = await post_json(self.url, [json.loads(payload) for _, payload in batch])
+        except Exception as e:
+            return self._unavailable(f"{type(e).__name__}: {e}")
+        if status == 413 and len(batch) > 1:
+            # Too large for the website: retry right away in smaller requests
+            self.batch_size = max(1, len(batch) // 2)
+            print(f"⚠️ Outbox batch too large, sending {self.batch_size} courses per request")
+            return None
+        if status in REFUSED_STATUSES:
+            if len(batch) > 1:
+                # One course may be at fault: send the halves apart so only it is rejected
+                half = len(batch) // 2
+                return await self._send(batch[:half]) or await self._send(batch[half:])
+            self._failures = 0
+            await self._reject([(batch[0][0], f"HTTP {status}")])
+            return None
+        if status != 200 or not isinstance(body, dict):
+            return self._unavailable(f"HTTP {status}")
+        self._failures = 0
+
+        results = {r.get("index"): r for r in body.get("results", [])}
+        delivered, rejected = [], []
+        for index, (row_id, _) in enumerate(batch):
+            result = results.get(index, {})
+            if result.get("status") in ("created", "updated"):
+                delivered.append(row_id)
+            else:
+                rejected.append((row_id, result.get("error", "missing from response")))
+        await self._deliver(delivered)
+        await self._reject(rejected)
+        print(f"🌍 Outbox sent {len(delivered)}/{len(batch)} courses to the website")
+        return None
+
+    def _unavailable(self, error: str) -> float:
+        self._failures += 1
+        pause = backoff(self._failures, self.backoff_base, self.backoff_max)
+        print(f"⚠️ Website unavailable ({error}); retrying in {pause:.0f}s")
+        return pause
+
+    async def _deliver(self, row_ids: List[int]) -> None:
+        if not row_ids:
+            return
+        await self._db.run(self._settle_delivered, row_ids)
+        self.sent += len(row_ids)
+        self._reposts_ready.set()
+
+    def _settle_delivered(self, row_ids: List[int]) -> None:
+        with self._db.transaction() as conn:
+            for row_id in row_ids:
+                conn.execute(
+                    "INSERT INTO reposts (repost, delivered) "
+                    "SELECT repost, 1 FROM outbox WHERE id = ? AND repost IS NOT NULL", (row_id,)
+                )
+                conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    async def _reject(self, rows: List[Tuple[int, str]]) -> None:
+        if not rows:
+            return
+        outcomes = await self._db.run(self._record_errors, rows, time.time())
+        self.rejected += len(rows)
+        for row_id, attempts, dead, error in outcomes:
+            if dead:
+                print(f"❌ Website rejected course {row_id} {attempts} times, giving up: {error}")
+                self._reposts_ready.set()
+            else:
+                print(f"⚠️ Website rejected course {row_id} (attempt {attempts}): {error}")
+
+    def _record_errors(self, rows: List[Tuple[int, str]], now: float) -> List[Tuple[int, int, bool, str]]:
+        """Count an error against each row, marking it dead (and its repost undelivered) at the limit"""
+        outcomes = []
+        with self._db.transaction() as conn:
+            for row_id, error in rows:
+                (attempts,) = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (row_id,)).fetchone()
+                attempts += 1
+                dead = attempts >= self.max_attempts
+                conn.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, dead = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + backoff(attempts, self.backoff_base, self.backoff_max), int(dead), error, row_id)
+                )
+                if dead:
+                    conn.execute(
+                        "INSERT INTO reposts (repost, delivered) "
+                        "SELECT repost, 0 FROM outbox WHERE id = ? AND repost IS NOT NULL", (row_id,)
+                    )
+                outcomes.append((row_id, attempts, dead, error))
+        return outcomes
+
+    async def _run_reposts(self) -> None:
+        """Hand settled reposts to the handler in order, deleting each once it has run"""
+        while True:
+            self._reposts_ready.clear()
+            reposts = await self._db.run(
+                self._db.query, "SELECT id, repost, delivered FROM reposts ORDER BY id LIMIT ?", (REPOST_BATCH,)
+            )
+            if not reposts:
+                await self._reposts_ready.wait()
+                continue
+            for repost_id, repost, delivered in reposts:
+                try:
+                    await self.on_repost(json.loads(repost), bool(delivered))
+                except Exception as e:
+                    print(f"❌ Repost failed: {e}")
+                await self._db.run(self._db.execute, "DELETE FROM reposts WHERE id = ?", (repost_id,))
+
+    def stats(self) -> dict:
+        pending, dead = self._db.query_one(
+            "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead), 0) FROM outbox"
+        )
+        (reposts,) = self._db.query_one("SELECT COUNT(*) FROM reposts")
+        return {"pending": pending, "dead": dead, "reposts": reposts, "sent": self.sent, "rejected": self.rejected}
+
+outbox = Outbox(
+    db_path("OUTBOX_PATH", "outbox.sqlite3"),
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "20")),
+    batch_bytes=int(os.getenv("OUTBOX_BATCH_BYTES", "4000000")),
+    backoff_base=float(os.getenv("OUTBOX_BACKOFF_BASE", "2")),
+    backoff_max=float(os.getenv("OUTBOX_BACKOFF_MAX", "300")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+)
@@ -1,26 +1,40 @@
+import asyncio
 import re
 import requests
-from curl_cffi import requests as cffi_requests
 from utils import udemy_slug_from_title, build_udemy_url
 from bs4 import BeautifulSoup
+from http_clients import fetch_page, fetch_page_as_browser
+from resolution_cache import cache as resolution_cache, normalize_url, course_page_key, is_definitive_failure
+
+def find_og_image(html: str) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+    og_image = soup.find("meta", property="og:image")
+    if og_image and og_image.get("content"):
+        return og_image["content"]
+    return None
+
+async def fetch_og_image(url: str) -> str:
+    if not url: return None
+    # Reposts of a course usually differ only in the coupon, so Udemy pages are keyed without it
+    key = course_page_key(url) if "udemy.com" in url else normalize_url(url)
+    found, metadata = resolution_cache.get("og", key)
+    if found:
+        return metadata["image"] if metadata else None
 
-def fetch_og_image(url: str) -> str:
     try:
-        if not url: return None
-        # Fake header to avoid being blocked
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        r = requests.get(url, headers=headers, timeout=10)
-        if r.status_code == 200:
-            # Simple regex search for og:image to avoid bs4 dependency if desired, or use it if installed.
-            # Assuming bs4 is installed since googlesearch-python uses it.
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(r.text, 'html.parser')
-            og_image = soup.find("meta", property="og:image")
-            if og_image and og_image.get("content"):
-                return og_image["content"]
+        status, html = await fetch_page(url, timeout=10)
     except Exception as e:
+        # Timeouts and connection errors are transient; don't cache them
         print(f"⚠️ Failed to fetch OG image: {e}")
-    return None
+        return None
+
+    image = None
+    if status == 200:
+        # Parsing a full Udemy page takes a while; keep it off the event loop
+        image = await asyncio.to_thread(find_og_image, html)
+    if status == 200 or is_definitive_failure(status):
+        resolution_cache.set("og", key, {"image": image} if image else None)
+    return image
 
 def udemy_url_exists(url: str) -> bool:
     try:
@@ -29,17 +43,44 @@ def udemy_url_exists(url: str) -> bool:
     except:
         return False
 
-def resolve_coursevania_link(url: str) -> str:
+def find_udemy_link(html: str) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Method 1: Look for "Get on Udemy" link
+    anchor = soup.find('a', string=re.compile(r"Get on Udemy", re.IGNORECASE))
+    if anchor and anchor.get('href'):
+        print(f"✅ Found 'Get on Udemy' link: {anchor['href']}")
+        return anchor['href']
+
+    # Method 2: Look for any udemy.com/course link
+    udemy_anchor = soup.find('a', href=re.compile(r"udemy\.com/course", re.IGNORECASE))
+    if udemy_anchor and udemy_anchor.get('href'):
+        print(f"✅ Found Udemy course link: {udemy_anchor['href']}")
+        return udemy_anchor['href']
+
+    return None
+
+async def resolve_coursevania_link(url: str) -> str:
     """
     Follows a Coursevania link and extracts the actual Udemy URL.
     Uses curl_cffi to impersonate a real chrome browser (JA3 fingerprinting) to bypass WAFs.
+    Runs on the shared async pool, so other messages keep flowing while a slow page loads.
     """
     try:
         if "coursevania.com" not in url:
             return url
 
+        key = normalize_url(url)
+        found, resolved = resolution_cache.get("coursevania", key)
+        if found:
+            print(f"💾 Coursevania link from cache: {resolved or 'unresolved, skipping'}")
+            return resolved or url
+
         print(f"🔄 Resolving Coursevania link: {url}")
         
+        # Only a last attempt that answered (without a link, or with a 4xx) is cached as a failure
+        definitive = False
+
         # Try multiple times with increasing timeout
         for attempt in range(3):
             try:
@@ -47,38 +88,31 @@ def resolve_coursevania_link(url: str) -> str:
                 print(f"  Attempt {attempt + 1}/3 (curl_cffi, timeout: {timeout}s)...")
                 
                 # impersonate="chrome" handles the TLS fingerprinting that cloudscraper misses
-                r = cffi_requests.get(
-                    url, 
-                    impersonate="chrome", 
-                    timeout=timeout, 
-                    allow_redirects=True
-                )
+                status, html = await fetch_page_as_browser(url, timeout=timeout)
                 
-                if r.status_code == 200:
-                    soup = BeautifulSoup(r.text, 'html.parser')
-                    
-                    # Method 1: Look for "Get on Udemy" link
-                    anchor = soup.find('a', string=re.compile(r"Get on Udemy", re.IGNORECASE))
-                    if anchor and anchor.get('href'):
-                        print(f"✅ Found 'Get on Udemy' link: {anchor['href']}")
-                        return anchor['href']
-                    
-                    # Method 2: Look for any udemy.com/course link
-                    udemy_anchor = soup.find('a', href=re.compile(r"udemy\.com/course", re.IGNORECASE))
-                    if udemy_anchor and udemy_anchor.get('href'):
-                        print(f"✅ Found Udemy course link: {udemy_anchor['href']}")
-                        return udemy_anchor['href']
+                if status == 200:
+                    link = await asyncio.to_thread(find_udemy_link, html)
+                    if link:
+                        resolution_cache.set("coursevania", key, link)
+                        return link
                     
                     print("⚠️ Page loaded but no Udemy link found")
+                    definitive = True
                     break  # Don't retry if page loaded successfully
+
+                print(f"  ⚠️ Page returned {status}")
+                definitive = is_definitive_failure(status)
                     
             except Exception as e:
+                definitive = False
                 print(f"  ⚠️ Error/Timeout on attempt {attempt + 1}: {e}")
                 if attempt == 2:
                     print("❌ All attempts failed")
                     break
         
         print("⚠️ Returning original URL (resolution failed)")
+        if definitive:
+            resolution_cache.set("coursevania", key, None)
         return url
         
     except Exception as e:
@@ -169,7 +203,14 @@ def build_udemy_link(title: str, coupon: str):
     slug = udemy_slug_from_title(title)
     return f"https://www.udemy.com/course/{slug}/?couponCode={coupon}"
 
-def parse_course(message):
+async def parse_course(message, fetch_image: bool = True):
+    """
+    Extracts title, description and course link from a channel post.
+    fetch_image=False skips the og:image lookup, for posts whose own photo will be used.
+    """
+    async def image_for(link):
+        return await fetch_og_image(link) if fetch_image else None
+
     text = message.text or ""
     lines = [l.strip() for l in text.split("\n") if l.strip()]
 
@@ -188,7 +229,7 @@ def parse_course(message):
         # 🆕 Attempt to resolve if it's a Coursevania link
         if "coursevania.com" in link:
             print(f"📍 Found Coursevania link, extracting Udemy URL...")
-            resolved_link = resolve_coursevania_link(link)
+            resolved_link = await resolve_coursevania_link(link)
             if "udemy.com" in resolved_link:
                 print(f"✅ Coursevania extraction successful!")
                 return {
@@ -196,7 +237,7 @@ def parse_course(message):
                     "description": description,
                     "udemy_link": resolved_link,
                     "status": "AUTO_RESOLVED",
-                    "image_url": fetch_og_image(resolved_link)
+                    "image_url": await image_for(resolved_link)
                 }
         
         # Check if it's a direct Udemy link
@@ -207,7 +248,7 @@ def parse_course(message):
                 "description": description,
                 "udemy_link": link,
                 "status": "AUTO",
-                "image_url": fetch_og_image(link)
+                "image_url": await image_for(link)
             }
 
     # 1️⃣ FALLBACK: Extract Coupon & Build Link (only if no links found)
@@ -220,7 +261,7 @@ def parse_course(message):
             "description": description,
             "udemy_link": direct_link,
             "status": "DIRECT_UDEMY",
-            "image_url": fetch_og_image(direct_link)
+            "image_url": await image_for(direct_link)
         }
 
     # 2️⃣ If we found a link but it's not Coursevania or Udemy
@@ -232,7 +273,7 @@ def parse_course(message):
             "description": description,
             "udemy_link": link,
             "status": "AUTO_OTHER_LINK",
-             "image_url": fetch_og_image(link)
+             "image_url": await image_for(link)
         }
 
     # 2️⃣ Button link (Enroll Now)
@@ -243,7 +284,7 @@ def parse_course(message):
             "description": description,
             "udemy_link": button_link,
             "status": "AUTO_BUTTON",
-            "image_url": fetch_og_image(button_link)
+            "image_url": await image_for(button_link)
         }
 
     # Final fallback
@@ -0,0 +1,91 @@
+"""
+Staged asyncio pipeline.
+
+Each stage has its own bounded queue and a fixed number of worker tasks.
+A worker takes a job, runs the stage function on it and hands the result
+to the next stage's queue; returning None drops the job. Because every
+queue is bounded, a slow stage backs up into the one before it and finally
+into submit(), which then waits. That backpressure reaches Telegram update
+handling, so a burst never turns into an unbounded number of tasks.
+
+drain() waits until every submitted job has left the last stage (or the
+timeout passes), then stops the workers.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+
+StageFunc = Callable[[dict], Awaitable[Optional[dict]]]
+
+class Stage:
+    def __init__(self, name: str, func: StageFunc, workers: int, queue_size: int):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.failed = 0
+
+class Pipeline:
+    """Runs jobs through stages in order, each with bounded concurrency"""
+
+    def __init__(self, on_error: Optional[Callable[[str, dict, Exception], None]] = None):
+        self.stages: List[Stage] = []
+        self.on_error = on_error
+        self._tasks: List[asyncio.Task] = []
+
+    def add_stage(self, name: str, func: StageFunc, workers: int = 1, queue_size: int = 16) -> "Pipeline":
+        self.stages.append(Stage(name, func, workers, queue_size))
+        return self
+
+    def start(self) -> None:
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                self._tasks.append(asyncio.create_task(self._work(stage, following), name=f"{stage.name}-{n}"))
+
+    async def submit(self, job: dict) -> None:
+        """Queue a job for the first stage, waiting while the pipeline is full"""
+        await self.stages[0].queue.put(job)
+
+    async def _work(self, stage: Stage, following: Optional[Stage]) -> None:
+        while True:
+            job = await stage.queue.get()
+            try:
+                result = await stage.func(job)
+                stage.processed += 1
+                if result is not None and following is not None:
+                    await following.queue.put(result)
+            except Exception as e:
+                stage.failed += 1
+                if self.on_error:
+                    self.on_error(stage.name, job, e)
+                else:
+                    print(f"❌ ERROR in {stage.name} stage:", e)
+            finally:
+                stage.queue.task_done()
+
+    async def drain(self, timeout: float = 30) -> None:
+        """Finish queued jobs stage by stage, then stop the workers"""
+        deadline = time.monotonic() + timeout
+        try:
+            for stage in self.stages:
+                await asyncio.wait_for(stage.queue.join(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            pending = sum(stage.queue.qsize() for stage in self.stages)
+            print(f"⚠️ Pipeline drain timed out with {pending} queued jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            stage.name: {
+                "queued": stage.queue.qsize(),
+                "processed": stage.processed,
+                "failed": stage.failed
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,127 @@
+"""
+Persistent cache of link resolutions, kept in SQLite next to the bot.
+
+    coursevania   Coursevania URL -> resolved Udemy URL
+    og            Udemy course URL (without coupon) -> {"image": og:image URL}
+
+The same course is often reposted across SOURCE_CHANNELS or re-announced
+days later; with this cache those repeats cost no outbound HTTP. Definitive
+failures (the page loaded without what we looked for, or answered with a
+4xx) are cached too, for a shorter time, so a dead page isn't refetched for
+every repost; timeouts, connection errors, 5xx and 429 are not. Expired
+entries are purged, and the least recently used ones evicted once the table
+passes its limit, every EVICT_EVERY writes.
+
+Lookups read SQLite directly; stores and access times are written behind on
+the file's writer thread (see local_db.py), so they never hold up the loop.
+
+Settings (env):
+    RESOLUTION_CACHE_PATH      SQLite file (default: resolution_cache.sqlite3 next to the bot)
+    RESOLUTION_CACHE_ENTRIES   maximum rows (default: 20000)
+"""
+
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+from local_db import LocalDB, db_path
+
+DAY = 24 * 3600
+
+# Seconds to keep (successes, failures) per kind
+TTLS = {
+    "coursevania": (30 * DAY, 3600),
+    "og": (7 * DAY, 6 * 3600),
+}
+
+EVICT_EVERY = 100
+
+def is_definitive_failure(status: int) -> bool:
+    """A response worth caching as a failure; rate limits and server errors are not"""
+    return 400 <= status < 500 and status != 429
+
+def normalize_url(url: str) -> str:
+    """Cache key for a source URL: no fragment, lowercase host, no trailing slash"""
+    parts = urlsplit(url.strip())
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}{query}"
+
+def course_page_key(url: str) -> str:
+    """Cache key for a Udemy course page; the coupon doesn't change its metadata"""
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+class ResolutionCache:
+    """SQLite-backed TTL cache with negative entries and LRU eviction"""
+
+    def __init__(self, path: str, max_entries: int = 20000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._db = LocalDB(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS resolutions (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS resolutions_accessed ON resolutions (accessed_at)")
+        self._evict(time.time())
+
+    def get(self, kind: str, key: str):
+        """Return (found, value); a cached failure is found with value None"""
+        now = time.time()
+        row = self._db.query_one(
+            "SELECT value FROM resolutions WHERE kind = ? AND key = ? AND expires_at > ?", (kind, key, now)
+        )
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._db.submit(
+            self._db.execute, "UPDATE resolutions SET accessed_at = ? WHERE kind = ? AND key = ?", (now, kind, key)
+        )
+        return True, None if row[0] is None else json.loads(row[0])
+
+    def set(self, kind: str, key: str, value) -> None:
+        """Store a result; None records a failure and expires sooner"""
+        success_ttl, failure_ttl = TTLS[kind]
+        now = time.time()
+        expires_at = now + (failure_ttl if value is None else success_ttl)
+        stored = None if value is None else json.dumps(value)
+        self._db.submit(self._store, kind, key, stored, expires_at, now)
+
+    def _store(self, kind: str, key: str, stored, expires_at: float, now: float) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO resolutions (kind, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, key, stored, expires_at, now)
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM resolutions WHERE expires_at <= ?", (now,))
+        (count,) = self._db.query_one("SELECT COUNT(*) FROM resolutions")
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM resolutions WHERE rowid IN "
+                "(SELECT rowid FROM resolutions ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        (count,) = self._db.query_one("SELECT COUNT(*) FROM resolutions")
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+cache = ResolutionCache(
+    db_path("RESOLUTION_CACHE_PATH", "resolution_cache.sqlite3"),
+    max_entries=int(os.getenv("RESOLUTION_CACHE_ENTRIES", "20000"))
+)
@@ -1,6 +1,7 @@
 """
 Test script to verify Coursevania link extraction works end-to-end
 """
+import asyncio
 import sys
 sys.path.insert(0, 'c:\\Users\\jonat\\OneDrive\\Desktop\\autoweb\\telegram-course-bot')
 
@@ -22,7 +23,7 @@ print("=" * 60)
 print(f"\n1. Resolving Coursevania link...")
 print(f"   Input: {coursevania_url}")
 
-udemy_link = resolve_coursevania_link(coursevania_url)
+udemy_link = asyncio.run(resolve_coursevania_link(coursevania_url))
 
 print(f"\n2. Result:")
 print(f"   Extracted Link: {udemy_link}")
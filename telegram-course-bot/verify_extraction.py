@@ -1,3 +1,4 @@
+import asyncio
 from parser import resolve_coursevania_link
 import sys
 
@@ -5,7 +6,7 @@ import sys
 url = "https://coursevania.com/courses/mastering-adobe-illustrator-projects-build-your-portfolio/"
 
 print(f"Testing resolution for: {url}")
-resolved = resolve_coursevania_link(url)
+resolved = asyncio.run(resolve_coursevania_link(url))
 
 print(f"Result: {resolved}")
 